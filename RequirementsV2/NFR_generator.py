@@ -1,41 +1,138 @@
-from operator import itemgetter
+import argparse
+import re
+import sys
+from operator import attrgetter
 
-N_NFR_before = 10
-N_FR_before = 3
+import docgenpath  # noqa: F401
+from docgen import instrument
+from numbering import DOCUMENT, NUMBERING
+
+SHARD = "extension"
+_FR_REF = re.compile(r"(?:FR)?\s*(\d+)(?:\.(\d+))?")
 
 
 class NFR:
+    __slots__ = ("type", "descr", "FR")
+
     def __init__(self, type, descr, FR) -> None:
         self.type = type
         self.descr = descr
-        self.FR = FR
+        self.FR = tuple(tuple(fr) for fr in FR)
+
+    def key(self):
+        return (self.type, self.descr, self.FR)
 
-    def __lt__(self, obj):
-        return (self.type) < (obj.type)
+    def __eq__(self, obj):
+        return isinstance(obj, NFR) and self.key() == obj.key()
 
-    def __gt__(self, obj):
-        return (self.type) > (obj.type)
+    def __hash__(self):
+        return hash(self.key())
 
-    def __le__(self, obj):
-        return (self.type) <= (obj.type)
 
-    def __ge__(self, obj):
-        return (self.type) >= (obj.type)
+def FRref(fr, FRbefore=None):
+    if FRbefore is None:
+        FRbefore = NUMBERING.offset(SHARD, "FR")
+    return f"{fr[0]+FRbefore}{'.'+str(fr[1]) if len(fr) > 1 else ''}"
 
-    def __eq__(self, obj):
-        return self.type == obj.type
 
+def sortedNFRs(NFRs):
+    """NFRs ordered by type, then by declared order (sorted() is stable); the input is left untouched."""
+    return sorted(NFRs, key=attrgetter("type"))
+
+
+def nfr(sink=None):
+    sink = sink or sys.stdout
+    NFRbefore = NUMBERING.offset(SHARD, "NFR")
+    FRbefore = NUMBERING.offset(SHARD, "FR")
+    refs = {}
+    rows = []
+    for index, NFR in enumerate(sortedNFRs(NFRs)):
+        # Catalogues reuse the same FR lists a lot, format each distinct one once
+        FR = refs.get(NFR.FR)
+        if FR is None:
+            FR = refs[NFR.FR] = ", ".join([FRref(fr, FRbefore) for fr in NFR.FR])
+        rows.append(f"| NFR{NFRbefore + index+1} | {NFR.type} | {NFR.descr} | FR {FR} |\n")
+    sink.write("".join(rows))
+
+
+class NFRIndex:
+    """FR -> NFR traceability, using the FR and NFR numbers shown in the document.
+
+    A whole-FR reference such as (3,) constrains every sub-requirement of
+    FR 3, so lookups of FR 3.x also return it.
+    """
+
+    def __init__(self, NFRs, shard=None):
+        shard = shard or SHARD
+        self.NFRbefore = NUMBERING.offset(shard, "NFR")
+        FRbefore = NUMBERING.offset(shard, "FR")
+        self.NFRs = sortedNFRs(NFRs)
+        self.whole = {}  # fr -> NFR positions referencing the whole FR
+        self.exact = {}  # (fr, sub) -> NFR positions
+        self.any = {}  # fr -> NFR positions referencing the FR or any sub-requirement
+        for pos, NFR in enumerate(self.NFRs):
+            for ref in NFR.FR:
+                fr = ref[0] + FRbefore
+                if len(ref) > 1:
+                    self._add(self.exact, (fr, ref[1]), pos)
+                else:
+                    self._add(self.whole, fr, pos)
+                self._add(self.any, fr, pos)
+
+    @staticmethod
+    def _add(index, key, pos):
+        positions = index.setdefault(key, [])
+        if not positions or positions[-1] != pos:
+            positions.append(pos)
 
-def nfr():
-    NFRs.sort()
-    for index, NFR in enumerate(NFRs):
-        FR = ", ".join(
-            [
-                f"{fr[0]+N_FR_before}{'.'+str(fr[1]) if len(fr) > 1 else ''}"
-                for fr in NFR.FR
-            ]
-        )
-        print(f"| NFR{N_NFR_before + index+1} | {NFR.type} | {NFR.descr} | FR {FR} |")
+    @staticmethod
+    def parse(ref):
+        """'3.4', 'FR3.4' or 'FR 3' -> (3, 4) / (3,); ValueError for anything else"""
+        match = _FR_REF.fullmatch(ref.strip().upper())
+        if match is None:
+            raise ValueError(f"invalid FR reference {ref!r}, expected an FR number like 4 or 4.1")
+        return tuple(int(part) for part in match.groups() if part is not None)
+
+    def positions(self, fr, sub=None):
+        if sub is None:
+            return self.any.get(fr, [])
+        whole = self.whole.get(fr, [])
+        exact = self.exact.get((fr, sub), [])
+        if not whole or not exact:
+            return whole or exact
+        return sorted(set(whole).union(exact))
+
+    def query(self, fr, sub=None):
+        """(NFR number, NFR) pairs constraining FR `fr` or FR `fr`.`sub`."""
+        return [(self.NFRbefore + pos + 1, self.NFRs[pos]) for pos in self.positions(fr, sub)]
+
+    def rows(self):
+        """Matrix rows in FR order: whole FRs first, then their sub-requirements."""
+        subs = {}
+        for fr, sub in self.exact:
+            subs.setdefault(fr, []).append(sub)
+        for fr in sorted(self.any):
+            if fr in self.whole:
+                yield (fr, None)
+            for sub in sorted(subs.get(fr, [])):
+                yield (fr, sub)
+
+    def matrix(self, sink=None):
+        sink = sink or sys.stdout
+        n = len(self.NFRs)
+        header = " | ".join(f"NFR{self.NFRbefore + pos + 1}" for pos in range(n))
+        lines = [f"| FR | {header} |\n", f"|:-|{':-:|' * n}\n"]
+        for fr, sub in self.rows():
+            # Only the marked cells are visited; the empty runs between them
+            # are repeated separators
+            cells, last = [], 0
+            for pos in self.whole[fr] if sub is None else self.positions(fr, sub):
+                cells += [" | " * (pos - last), "X"]
+                last = pos
+            cells.append(" | " * (n - 1 - last))
+            name = f"FR {fr}" if sub is None else f"FR {fr}.{sub}"
+            lines.append(f"| {name} | {''.join(cells)} |\n")
+        sink.write("".join(lines))
 
 
 NFRs = [
@@ -117,5 +214,55 @@ NFRs = [
 ]
 
 
+def main(argv=None):
+    global NFRs, SHARD
+
+    parser = argparse.ArgumentParser(description="Print the NFR table rows")
+    parser.add_argument("--data", help="load NFRs from a JSON/YAML/TOML file instead of NFRs")
+    parser.add_argument(
+        "--shard",
+        default=SHARD,
+        choices=[shard.name for shard in DOCUMENT],
+        help="numbering shard of these NFRs (see numbering.py)",
+    )
+    parser.add_argument("--fr", action="append", help="only list the NFRs constraining FR x or x.y")
+    parser.add_argument("--matrix", action="store_true", help="print the FR x NFR traceability matrix")
+    parser.add_argument("--profile", help="write a JSON timing report (or a .prof cProfile dump)")
+    args = parser.parse_args(argv)
+    SHARD = args.shard
+    try:
+        refs = [NFRIndex.parse(ref) for ref in args.fr or []]
+    except ValueError as e:
+        parser.error(str(e))
+
+    with instrument.session("nfr", args.profile):
+        with instrument.phase("load"):
+            if args.data:
+                from loader import loadNFRs
+
+                NFRs = loadNFRs(args.data)
+        instrument.count("nfrs", len(NFRs))
+
+        if args.fr or args.matrix:
+            with instrument.phase("index"):
+                index = NFRIndex(NFRs)
+            with instrument.phase("render"):
+                for ref in refs:
+                    hits = index.query(*ref)
+                    print(f"FR {'.'.join(map(str, ref))}: {len(hits)} NFR(s)")
+                    for number, NFR in hits:
+                        print(f"  NFR{number} | {NFR.type} | {NFR.descr}")
+                if args.matrix:
+                    index.matrix(instrument.writer(sys.stdout))
+            return
+
+        with instrument.phase("render"):
+            nfr(instrument.writer(sys.stdout))
+
+
 if __name__ == "__main__":
-    nfr()
+    # Run through the importable module so that objects built by the loader
+    # share their class with it
+    import NFR_generator
+
+    NFR_generator.main()
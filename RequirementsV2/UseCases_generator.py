@@ -1,57 +1,144 @@
-from slugify import slugify
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from sys import intern
 
-N_UC_before = 0
+import docgenpath  # noqa: F401
+from anchors import Anchors
+from docgen import instrument
+from docgen.output import open_output
+from docgen.splice import splice
+from numbering import DOCUMENT, NUMBERING
+from steptrie import StepTrie
+
+SHARD = "usecases"
+CACHE_FILE = ".out.md.cache"
+COMMON_STEPS = False
+
+anchors = Anchors()
 
 
 class UseCase:
+    __slots__ = ("name", "actors", "pre", "post", "nominal", "variants", "exceptions", "scenarios", "sharing", "table")
+
     def __init__(self, name, actors, pre, post, nominal, variants, exceptions) -> None:
         self.name = name
-        self.actors = actors
-        self.pre = pre
-        self.post = post
-        self.nominal = nominal
-        self.variants = variants
-        self.exceptions = exceptions
+        self.actors = intern(actors)
+        self.pre = intern(pre)
+        self.post = intern(post)
+        self.nominal = tuple(nominal)
+        self.variants = tuple(variants)
+        self.exceptions = tuple(exceptions)
+        self.scenarios = self.nominal + self.variants + self.exceptions
+        self.sharing = None  # see stepSharing()
+        self.table = None  # (index, rendered common step table), see commonStepTable()
 
     def fullName(self, index):
         return f"Use case {index}, UC{index}: {self.name}"
 
+    def anchor(self, index, service=None):
+        return (service or anchors).anchor(("UC", index), self.fullName(index))
+
     def link(self, index):
-        return f"[{self.fullName(index)}](#{slugify(self.fullName(index))})"
+        return f"[{self.fullName(index)}](#{self.anchor(index)})"
 
     def getScenarios(self):
-        return self.nominal + self.variants + self.exceptions
+        return self.scenarios
 
-    def details(self, index, f):
-        f.write(f"### {self.fullName(index)}\n\n")
-        f.write(f"|Actors involved|{self.actors}\n")
-        f.write("|:-:|:-|\n")
-        f.write(f"|Precondition|{self.pre}|\n")
-        f.write(f"|Post condition|{self.post}|\n")
-        f.write(
-            f"|Nominal Scenario|{ ', '.join([ s.link(index, id+1) for (id, s) in enumerate(self.nominal)])}|\n"
-        )
-        f.write(
-            f"|Variants|{ ', '.join([ s.link(index, id+1 + len(self.nominal)) for (id, s) in enumerate(self.variants)])}|\n"
-        )
-        f.write(
-            f"|Exceptions|{ ', '.join([ s.link(index, id+1 + len(self.nominal+self.variants)) for (id, s) in enumerate(self.exceptions)])}|\n\n"
+    def key(self):
+        return (
+            self.name,
+            self.actors,
+            self.pre,
+            self.post,
+            [s.key() for s in self.nominal],
+            [s.key() for s in self.variants],
+            [s.key() for s in self.exceptions],
         )
 
-        for id, s in enumerate(self.nominal):
-            s.details(index, id + 1, f)
-        for id, s in enumerate(self.variants):
-            s.details(index, id + 1 + len(self.nominal), f)
-        for id, s in enumerate(self.exceptions):
-            s.details(index, id + 1 + len(self.nominal + self.variants), f)
+    def render(self, index, toc, body, commonSteps=False):
+        """Write the TOC entry to `toc` and the detailed section to `body` in one walk.
+
+        With `commonSteps`, steps shared by several scenarios are listed
+        once, and each scenario only lists the steps where it diverges.
+        """
+        links = [s.link(index, id + 1) for id, s in enumerate(self.scenarios)]
+        nVariants = len(self.nominal) + len(self.variants)
+
+        toc.write(f"\t- {self.link(index)}\n")
+        for link in links:
+            toc.write(f"\t\t- {link}\n")
+
+        body.write(f"### {self.fullName(index)}\n\n")
+        body.write(f"|Actors involved|{self.actors}\n")
+        body.write("|:-:|:-|\n")
+        body.write(f"|Precondition|{self.pre}|\n")
+        body.write(f"|Post condition|{self.post}|\n")
+        body.write(f"|Nominal Scenario|{', '.join(links[:len(self.nominal)])}|\n")
+        body.write(f"|Variants|{', '.join(links[len(self.nominal):nVariants])}|\n")
+        body.write(f"|Exceptions|{', '.join(links[nVariants:])}|\n\n")
+
+        if not commonSteps:
+            for id, s in enumerate(self.scenarios):
+                s.details(index, id + 1, body)
+            return
+
+        commons = self.stepSharing()[1]
+        body.write(self.commonStepTable(index))
+        for id, s in enumerate(self.scenarios):
+            s.details(index, id + 1, body, commons[id])
+
+    def stepSharing(self):
+        """(StepTrie.shared() runs, leading steps each scenario shares), built on first use.
+
+        The scenarios are fixed once the use case is built, so the trie is
+        only built once, not on every render.
+        """
+        if self.sharing is None:
+            if len({s.steps[:1] for s in self.scenarios}) == len(self.scenarios):
+                # Scenarios that all start differently share nothing, skip the trie
+                self.sharing = ((), (0,) * len(self.scenarios))
+            else:
+                trie = StepTrie(s.steps for s in self.scenarios)
+                self.sharing = (tuple(trie.shared()), tuple(trie.commons))
+        return self.sharing
+
+    def commonStepTable(self, index):
+        """The "Common step" table, or "" if nothing is shared; kept for the last `index`.
+
+        The scenario codes in it depend on the use case's number, which only
+        changes when use cases are added or moved.
+        """
+        if self.table is None or self.table[0] != index:
+            shared = self.stepSharing()[0]
+            rows = []
+            if shared:
+                rows.append("|Step#|Common step|Scenarios|\n|:-:|:-|:-|\n")
+                for first, steps, scenarios in shared:
+                    codes = ", ".join([f"{index}.{n}" for n in scenarios])
+                    rows += [f"|{stepNo}|{step}|{codes}|\n" for stepNo, step in enumerate(steps, first)]
+                rows.append("\n")
+            self.table = (index, "".join(rows))
+        return self.table[1]
 
 
 class Scenario:
+    # Pre/post conditions and steps repeat across many scenarios, so they
+    # are interned and shared rather than stored once per scenario
+    __slots__ = ("name", "pre", "post", "steps")
+
     def __init__(self, name: str, pre: str, post: str, steps: list[str]):
         self.name = name
-        self.pre = pre
-        self.post = post
-        self.steps = steps
+        self.pre = intern(pre)
+        self.post = intern(post)
+        self.steps = tuple(intern(step) for step in steps)
+
+    def key(self):
+        return (self.name, self.pre, self.post, self.steps)
 
     def code(self, UCindex, index):
         return f"Scenario {UCindex}.{index}"
@@ -59,34 +146,123 @@ class Scenario:
     def fullName(self, UCindex, index):
         return f"{self.code(UCindex, index)}: {self.name}"
 
+    def anchor(self, UCindex, index, service=None):
+        fullName = self.fullName(UCindex, index)
+        return (service or anchors).anchor(("Scenario", UCindex, index), fullName.replace(".", ""))
+
     def link(self, UCindex, index):
-        return f"[{self.fullName(UCindex, index)}](#{slugify(self.fullName(UCindex, index).replace('.', ''))})"
+        return f"[{self.fullName(UCindex, index)}](#{self.anchor(UCindex, index)})"
 
-    def details(self, UCindex, index, f):
+    def details(self, UCindex, index, f, common=0):
+        """`common` leading steps are left to the use case's common steps."""
         f.write(f"##### {self.fullName(UCindex, index)}\n\n")
         f.write(f"|{self.code(UCindex, index)}|{self.name}\n")
         f.write("|:-:|:-|\n")
         f.write(f"|Precondition|{self.pre}|\n")
         f.write(f"|Post condition|{self.post}|\n")
         f.write("|Step#|Description|\n")
-        for stepNo, step in enumerate(self.steps):
-            f.write(f"|{stepNo+1}|{step}|\n")
+        if common:
+            f.write(f"|1-{common}|Common steps 1-{common}|\n" if common > 1 else "|1|Common step 1|\n")
+        rows = enumerate(self.steps[common:], common + 1)
+        f.write("".join([f"|{stepNo}|{step}|\n" for stepNo, step in rows]))
         f.write("\n")
 
 
-def UseCases(type, f):
-    if type not in ["links", "text"]:
-        print("UseCases type must be 'links' or 'text'")
-        return
+def UCanchors(UC, index):
+    return (UC.anchor(index),) + tuple(
+        s.anchor(index, sID + 1) for sID, s in enumerate(UC.getScenarios())
+    )
 
+
+def assignAnchors():
+    # Anchors are handed out in document order so that duplicate headings
+    # get the same -1/-2 suffixes GitHub gives them
+    anchors.reset()
+    first = NUMBERING.offset(SHARD, "UC")
     for ucID, UC in enumerate(UCs):
-        if type == "links":
-            f.write(f"\t- {UC.link(ucID + 1 + N_UC_before)}\n")
-            for sID, scenario in enumerate(UC.getScenarios()):
-                f.write(f"\t\t- {scenario.link(ucID+1 + N_UC_before, sID+1)}\n")
+        UCanchors(UC, ucID + 1 + first)
+
+
+def render(UC, index):
+    toc, body = io.StringIO(), io.StringIO()
+    UC.render(index, toc, body, COMMON_STEPS)
+    return toc.getvalue(), body.getvalue()
 
-        else:
-            UC.details(ucID + 1 + N_UC_before, f)
+
+class RenderCache:
+    """On-disk cache of rendered fragments, keyed by UseCase content and index."""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.used = {}
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def digest(UC, index):
+        key = (index, UC.key(), UCanchors(UC, index), COMMON_STEPS)
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def get(self, digest):
+        fragments = self.entries.get(digest)
+        if isinstance(fragments, list) and len(fragments) == 2:
+            self.used[digest] = fragments
+            return tuple(fragments)
+        return None
+
+    def put(self, digest, fragments):
+        self.used[digest] = list(fragments)
+
+    def save(self):
+        # Only fragments used by this run are kept, so stale ones don't pile up
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.used, f)
+        os.replace(tmp, self.path)
+
+
+def _initWorker(byKey, commonSteps):
+    global COMMON_STEPS
+    # Workers must reuse the parent's anchors, suffixes depend on the whole document
+    anchors.byKey.update(byKey)
+    COMMON_STEPS = commonSteps
+
+
+def _renderChunk(chunk):
+    return [render(UC, index) for UC, index in chunk]
+
+
+def renderAll(items, jobs=1):
+    if jobs <= 1 or len(items) < 2:
+        return [render(UC, index) for UC, index in items]
+
+    size = -(-len(items) // (jobs * 4))
+    chunks = [items[i : i + size] for i in range(0, len(items), size)]
+    with ProcessPoolExecutor(jobs, initializer=_initWorker, initargs=(anchors.byKey, COMMON_STEPS)) as pool:
+        # map() yields results in submission order, so the merge keeps the UC order
+        return [fragments for chunk in pool.map(_renderChunk, chunks) for fragments in chunk]
+
+
+def UseCases(cache=None, jobs=1):
+    """Render all use cases in one pass, returning the (links, text) sections."""
+    first = NUMBERING.offset(SHARD, "UC")
+    items = [(UC, ucID + 1 + first) for ucID, UC in enumerate(UCs)]
+    fragments = [None] * len(items)
+    if cache is not None:
+        digests = [cache.digest(UC, index) for UC, index in items]
+        fragments = [cache.get(digest) for digest in digests]
+
+    missing = [i for i, pair in enumerate(fragments) if pair is None]
+    rendered = renderAll([items[i] for i in missing], jobs)
+    for i, pair in zip(missing, rendered):
+        fragments[i] = pair
+        if cache is not None:
+            cache.put(digests[i], pair)
+
+    return "".join(toc for toc, _ in fragments), "".join(body for _, body in fragments)
 
 
 UCs = [
@@ -739,9 +915,66 @@ UCs = [
 ]
 
 
+def main(argv=None):
+    global UCs, SHARD, COMMON_STEPS
+
+    parser = argparse.ArgumentParser(description="Render the use cases into out.md")
+    parser.add_argument("--data", help="load use cases from a JSON/YAML/TOML file instead of UCs")
+    parser.add_argument(
+        "--shard",
+        default=SHARD,
+        choices=[shard.name for shard in DOCUMENT],
+        help="numbering shard of these use cases (see numbering.py)",
+    )
+    parser.add_argument(
+        "--common-steps",
+        action="store_true",
+        help="list the steps shared by several scenarios once per use case",
+    )
+    parser.add_argument("--stats", action="store_true", help="print anchor cache statistics")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="worker processes used for rendering (0 = all cores)"
+    )
+    parser.add_argument("--profile", help="write a JSON timing report (or a .prof cProfile dump)")
+    parser.add_argument(
+        "--splice", metavar="DOCUMENT", help="also update the usecases-toc and usecases regions of DOCUMENT"
+    )
+    args = parser.parse_args(argv)
+    jobs = args.jobs or os.cpu_count()
+    SHARD = args.shard
+    COMMON_STEPS = args.common_steps
+
+    with instrument.session("usecases", args.profile):
+        instrument.patch(sys.modules[Anchors.__module__], "slug", "slug")
+        with instrument.phase("load"):
+            if args.data:
+                from loader import loadUseCases
+
+                UCs = loadUseCases(args.data)
+            cache = RenderCache()
+        instrument.count("usecases", len(UCs))
+        instrument.count("scenarios", sum(len(UC.scenarios) for UC in UCs))
+
+        with instrument.phase("render"):
+            assignAnchors()
+            links, text = UseCases(cache, jobs)
+        with open_output("out.md") as f:
+            f = instrument.writer(f)
+            f.write("- tmp\n")
+            f.write(links)
+            f.write("\n\n\n\n")
+            f.write(text)
+        with instrument.phase("write"):
+            cache.save()
+            if args.splice:
+                splice(args.splice, {"usecases-toc": links, "usecases": text})
+    if args.stats:
+        print(json.dumps(anchors.stats()), file=sys.stderr)
+
+
 if __name__ == "__main__":
-    with open("out.md", "w") as f:
-        f.write("- tmp\n")
-        UseCases("links", f)
-        f.write("\n\n\n\n")
-        UseCases("text", f)
+    # Run through the importable module so that objects built by the loader
+    # (or unpickled from its cache) share class and anchor state with it
+    import UseCases_generator
+
+    UseCases_generator.main()
@@ -0,0 +1,63 @@
+"""Heading anchors shared by the requirements generators.
+
+Slugs are memoized in a bounded LRU, and every heading gets one stable
+anchor for the whole document. Duplicate slugs are suffixed with -1, -2,
+... in document order, the same way GitHub does it.
+"""
+from functools import lru_cache
+
+from slugify import slugify
+
+SLUG_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=SLUG_CACHE_SIZE)
+def slug(heading):
+    return slugify(heading)
+
+
+class Anchors:
+    def __init__(self, slug=None):
+        # heading -> slug. By default the module's slug() is looked up on
+        # each call, so a timed version patched in by --profile is used.
+        self.headingSlug = slug
+        self.reset()
+
+    def reset(self):
+        self.byKey = {}
+        self.used = set()
+        self.counts = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def anchor(self, key, heading):
+        """Anchor of the heading identified by `key`; assigned on first request."""
+        self.lookups += 1
+        a = self.byKey.get(key)
+        if a is not None:
+            self.hits += 1
+            return a
+
+        base = (self.headingSlug or slug)(heading)
+        n = self.counts.get(base, 0)
+        a = base if n == 0 else f"{base}-{n}"
+        while a in self.used:
+            n += 1
+            a = f"{base}-{n}"
+        self.counts[base] = n + 1
+        self.used.add(a)
+        self.byKey[key] = a
+        return a
+
+    def stats(self):
+        info = slug.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "anchors": len(self.byKey),
+            "anchor_lookups": self.lookups,
+            "anchor_hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "slug_hits": info.hits,
+            "slug_misses": info.misses,
+            "slug_hit_rate": info.hits / lookups if lookups else 0.0,
+            "slug_cache_size": info.currsize,
+        }
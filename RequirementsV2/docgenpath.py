@@ -0,0 +1,11 @@
+"""Put the repository root on sys.path, so the scripts here can import docgen.
+
+    import docgenpath  # noqa: F401
+    from docgen import instrument
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,89 @@
+"""Lint the use cases before they are rendered.
+
+    python lint.py [--data FILE] [--json] [--ignore CODES] [--strict]
+
+All checks run in a single walk over the use cases and their scenarios.
+Duplicates are found with one set of scenario names per use case, so
+the run is linear in the size of the corpus and cheap enough for a
+pre-commit hook. Diagnostics are printed one per line, as
+"<where>: <code> <message>", or as JSON lines with --json. Codes start
+with L, so they are not mistaken for use-case IDs. The exit status is 1
+if any error is reported, or any diagnostic at all with --strict.
+"""
+import argparse
+import json
+import sys
+
+import UseCases_generator
+from numbering import NUMBERING
+from UseCases_generator import UCs
+
+ERROR, WARNING = "error", "warning"
+
+CHECKS = {
+    "L101": (ERROR, "duplicate scenario name {name!r} (first used by {first})"),
+    "L102": (WARNING, "empty post condition"),
+    "L103": (WARNING, "scenario precondition {pre!r} differs from the use case's {expected!r}"),
+    "L104": (WARNING, "no {kind}, the table cell is left blank"),
+    "L105": (WARNING, "scenario has an empty post condition"),
+}
+
+KINDS = {"nominal": "nominal scenario", "variants": "variants", "exceptions": "exceptions"}
+
+
+def diagnostic(code, where, **args):
+    severity, message = CHECKS[code]
+    return {"code": code, "severity": severity, "where": where, "message": message.format(**args)}
+
+
+def lint(UCs, first=1):
+    """Yield the diagnostics for `UCs`, numbered from UC`first`."""
+    for ucID, UC in enumerate(UCs):
+        index = ucID + first
+        where = f"UC{index}"
+        if not UC.post.strip():
+            yield diagnostic("L102", where)
+        for attribute, kind in KINDS.items():
+            if not getattr(UC, attribute):
+                yield diagnostic("L104", where, kind=kind)
+
+        seen = {}  # scenario name -> first index
+        for id, s in enumerate(UC.scenarios, 1):
+            name = s.name.strip().casefold()
+            if name in seen:
+                yield diagnostic("L101", s.code(index, id), name=s.name, first=s.code(index, seen[name]))
+            else:
+                seen[name] = id
+            if s.pre != UC.pre:
+                yield diagnostic("L103", s.code(index, id), pre=s.pre, expected=UC.pre)
+            if not s.post.strip():
+                yield diagnostic("L105", s.code(index, id))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the use cases for common mistakes")
+    parser.add_argument("--data", help="lint a JSON/YAML/TOML data file instead of UCs")
+    parser.add_argument("--json", action="store_true", help="print diagnostics as JSON lines")
+    parser.add_argument("--ignore", default="", help="comma-separated codes to skip, e.g. L103,L104")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 on warnings too")
+    args = parser.parse_args()
+
+    if args.data:
+        from loader import loadUseCases
+
+        UCs = loadUseCases(args.data)
+    ignored = {code.strip() for code in args.ignore.split(",") if code.strip()}
+
+    failed = False
+    lines = []
+    for d in lint(UCs, NUMBERING.number(UseCases_generator.SHARD, "UC", 1)):
+        if d["code"] in ignored:
+            continue
+        failed = failed or args.strict or d["severity"] == ERROR
+        lines.append(json.dumps(d) if args.json else f"{d['where']}: {d['code']} {d['message']}")
+        if len(lines) >= 8192:
+            sys.stdout.write("\n".join(lines) + "\n")
+            lines = []
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+    sys.exit(1 if failed else 0)
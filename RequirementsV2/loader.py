@@ -0,0 +1,174 @@
+"""Load use cases and NFRs from JSON, YAML or TOML data files.
+
+Parsed objects are pickled next to the data file (".<name>.cache"). The
+cache is reused while the file's mtime and size are unchanged, or while
+its SHA-1 still matches after a touch, so warm starts skip parsing.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+import tomllib
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from NFR_generator import NFR, NFRs
+from UseCases_generator import UCs, Scenario, UseCase
+
+CACHE_VERSION = 4
+
+
+def parse(path, raw):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        return json.loads(raw)
+    if ext == ".toml":
+        return tomllib.loads(raw.decode())
+    if ext in (".yaml", ".yml"):
+        if yaml is None:
+            raise RuntimeError("PyYAML is required to load YAML data files")
+        return yaml.safe_load(raw)
+    raise ValueError(f"Unsupported data file type: {path}")
+
+
+def entries(data, key):
+    # Lists may be top level (JSON/YAML) or under a key (required by TOML)
+    return data[key] if isinstance(data, dict) else data
+
+
+def toScenario(d):
+    return Scenario(d["name"], d["pre"], d["post"], d["steps"])
+
+
+def toUseCase(d):
+    return UseCase(
+        d["name"],
+        d["actors"],
+        d["pre"],
+        d.get("post", ""),
+        nominal=[toScenario(s) for s in d.get("nominal", [])],
+        variants=[toScenario(s) for s in d.get("variants", [])],
+        exceptions=[toScenario(s) for s in d.get("exceptions", [])],
+    )
+
+
+def toNFR(d):
+    return NFR(d["type"], d["descr"], [tuple(fr) for fr in d["FR"]])
+
+
+def cachePath(path):
+    head, tail = os.path.split(path)
+    return os.path.join(head, f".{tail}.cache")
+
+
+def load(path, build, useCache=True):
+    st = os.stat(path)
+    cache = cachePath(path)
+    entry = None
+    if useCache:
+        try:
+            with open(cache, "rb") as f:
+                entry = pickle.load(f)
+            if entry.get("version") != CACHE_VERSION:
+                entry = None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            entry = None
+
+    if entry and (entry["mtime"], entry["size"]) == (st.st_mtime_ns, st.st_size):
+        return entry["data"]
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha1(raw).hexdigest()
+    if entry and entry["sha1"] == digest:
+        data = entry["data"]
+    else:
+        data = build(parse(path, raw))
+
+    if useCache:
+        entry = {
+            "version": CACHE_VERSION,
+            "mtime": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha1": digest,
+            "data": data,
+        }
+        tmp = cache + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache)
+    return data
+
+
+def loadUseCases(path, useCache=True):
+    return load(path, lambda data: [toUseCase(d) for d in entries(data, "usecases")], useCache)
+
+
+def loadNFRs(path, useCache=True):
+    return load(path, lambda data: [toNFR(d) for d in entries(data, "nfrs")], useCache)
+
+
+def dumpUseCases(UCs):
+    def scenario(s):
+        return {"name": s.name, "pre": s.pre, "post": s.post, "steps": list(s.steps)}
+
+    return {
+        "usecases": [
+            {
+                "name": UC.name,
+                "actors": UC.actors,
+                "pre": UC.pre,
+                "post": UC.post,
+                "nominal": [scenario(s) for s in UC.nominal],
+                "variants": [scenario(s) for s in UC.variants],
+                "exceptions": [scenario(s) for s in UC.exceptions],
+            }
+            for UC in UCs
+        ]
+    }
+
+
+def dumpNFRs(NFRs):
+    return {"nfrs": [{"type": n.type, "descr": n.descr, "FR": [list(fr) for fr in n.FR]} for n in NFRs]}
+
+
+def bench(path, kind, repeat=5):
+    loader = loadUseCases if kind == "usecases" else loadNFRs
+    timings = {}
+    for name, useCache in (("cold", False), ("warm", True)):
+        loader(path, useCache)  # populate the cache / OS file cache
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            loader(path, useCache)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Use case / NFR data files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write the built-in UCs or NFRs as JSON")
+    export.add_argument("kind", choices=["usecases", "nfrs"])
+    benchmark = sub.add_parser("bench", help="report cold (parse) and warm (cache) load times")
+    benchmark.add_argument("kind", choices=["usecases", "nfrs"])
+    benchmark.add_argument("path")
+    benchmark.add_argument("-n", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        data = dumpUseCases(UCs) if args.kind == "usecases" else dumpNFRs(NFRs)
+        json.dump(data, sys.stdout, indent=2)
+        print()
+    else:
+        timings = bench(args.path, args.kind, args.repeat)
+        for name, seconds in timings.items():
+            print(f"{name}: {seconds * 1000:.2f} ms")
+        print(f"speedup: {timings['cold'] / timings['warm']:.1f}x")
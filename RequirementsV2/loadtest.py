@@ -0,0 +1,449 @@
+"""Replay use case scenarios against the EZElectronics server and check the latency NFRs.
+
+    python loadtest.py [--start] [--url http://localhost:3001] [-c 10] [-d 10] [--scenario 8.1] [--json]
+
+Each Flow turns a Scenario of UseCases_generator.py into the HTTP
+requests that carry it out, "Scenario 8.1: Proceed to payment" being
+sign up, log in, add a product to the cart and check out. Flows are
+looked up by use case and scenario name, so they are reported under the
+scenario codes of the document, and a renamed scenario is caught rather
+than silently measured under a stale name.
+
+Scenarios are run one after the other. Each one runs for --duration
+seconds with --concurrency virtual users, each with its own session
+cookie, replaying the flow with a fresh user every time. Requests go
+through a pool of keep-alive HTTP/1.1 connections, written directly on
+asyncio streams, so no connection is opened per request and the client
+adds little time to the latency it measures. Only the steps a scenario
+is about are timed. Logging in before adding to the cart is setup, for
+instance.
+
+For every scenario the report gives the flows and requests per second
+and the p50/p95/p99 latency of the timed requests. It then checks those
+against the NFRs the scenario is bound to: NFR1, "requests should not
+take more than 1 second", for all of them, and "payment confirmation
+should take less than 1s" for checkout. The exit status is 1 if a p99
+misses its target or a flow fails. The statistics NFR has no endpoint in
+this version of the server.
+
+--start launches code/server (npx ts-node index.ts) with NODE_ENV=test,
+so the load goes to its test database. Run `npm install` there first.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import NFR_generator
+import UseCases_generator
+from numbering import NUMBERING
+
+PREFIX = "/ezelectronics"
+SEED_MODELS = 20
+SEED_QUANTITY = 10**6
+
+
+def nfrNumber(descr):
+    """Document number of an NFR of NFR_generator.py, from its description."""
+    for index, NFR in enumerate(NFR_generator.sortedNFRs(NFR_generator.NFRs), 1):
+        if NFR.descr == descr:
+            return f"NFR{NUMBERING.number(NFR_generator.SHARD, 'NFR', index)}"
+    raise KeyError(f"No NFR {descr!r} in NFR_generator.py")
+
+
+class Target:
+    __slots__ = ("name", "descr", "limit")
+
+    def __init__(self, name, descr, limit):
+        self.name = name
+        self.descr = descr
+        self.limit = limit  # seconds, for the p99 latency
+
+
+# NFR1 is written by hand in the base shard of the document
+REQUESTS = Target(f"NFR{NUMBERING.number('base', 'NFR', 1)}", "Requests should not take more than 1 second", 1.0)
+PAYMENT = Target(
+    nfrNumber("Payment confirmation should take less than 1s"), "Payment confirmation should take less than 1s", 1.0
+)
+
+
+class Step:
+    __slots__ = ("method", "path", "body", "timed")
+
+    def __init__(self, method, path, body=None, timed=True):
+        self.method = method
+        self.path = path  # may hold {user}, {model}... placeholders, as may body
+        self.body = body
+        self.timed = timed
+
+
+def fill(value, names):
+    if isinstance(value, str):
+        return value.format_map(names)
+    if isinstance(value, dict):
+        return {key: fill(item, names) for key, item in value.items()}
+    return value
+
+
+def signUp(role="Customer", timed=False):
+    body = {"username": "{user}", "name": "Load", "surname": "Test", "password": "{password}", "role": role}
+    return Step("POST", "/users", body, timed)
+
+
+def logIn(timed=False):
+    return Step("POST", "/sessions", {"username": "{user}", "password": "{password}"}, timed)
+
+
+def addToCart(timed=False):
+    return Step("POST", "/carts", {"model": "{model}"}, timed)
+
+
+def checkOut(timed=False):
+    return Step("PATCH", "/carts", None, timed)
+
+
+class Flow:
+    __slots__ = ("useCase", "scenario", "steps", "targets", "code", "title")
+
+    def __init__(self, useCase, scenario, steps, targets=()):
+        self.useCase = useCase
+        self.scenario = scenario
+        self.steps = steps
+        self.targets = (REQUESTS,) + tuple(targets)
+        self.code = self.title = None
+
+    def resolve(self, UCs, first=1):
+        """Find the flow's Scenario in `UCs` (numbered from UC`first`) for its code and title."""
+        for ucID, UC in enumerate(UCs):
+            if UC.name != self.useCase:
+                continue
+            for sID, s in enumerate(UC.scenarios, 1):
+                if s.name == self.scenario:
+                    self.code = f"{ucID + first}.{sID}"
+                    self.title = s.fullName(ucID + first, sID)
+                    return self
+        raise KeyError(f"No scenario {self.scenario!r} in use case {self.useCase!r}")
+
+
+FLOWS = [
+    Flow("Sign up", "Customer successfully creates account", [signUp(timed=True)]),
+    Flow("Login", "User logs in successfully", [signUp(), logIn(timed=True)]),
+    Flow("Logout", "User logs out", [signUp(), logIn(), Step("DELETE", "/sessions/current")]),
+    Flow(
+        "Retrieve products",
+        "Retrieve products by category",
+        [signUp(), logIn(), Step("GET", "/products/available?grouping=category&category=Smartphone")],
+    ),
+    Flow(
+        "Retrieve products",
+        "Retrieve products by model",
+        [signUp(), logIn(), Step("GET", "/products/available?grouping=model&model={model}")],
+    ),
+    Flow("Add products to the cart", "Product can be bought", [signUp(), logIn(), addToCart(timed=True)]),
+    Flow("Checkout", "Proceed to payment", [signUp(), logIn(), addToCart(), checkOut(timed=True)], [PAYMENT]),
+    Flow(
+        "View cart history",
+        "Customer views the cart history",
+        [signUp(), logIn(), addToCart(), checkOut(), Step("GET", "/carts/history")],
+    ),
+    Flow(
+        "Manage products",
+        "Manager adds a product",
+        [
+            signUp("Manager"),
+            logIn(),
+            Step(
+                "POST",
+                "/products",
+                {"model": "{newModel}", "category": "Laptop", "quantity": 5, "sellingPrice": 999.0},
+            ),
+        ],
+    ),
+]
+
+
+class FlowError(Exception):
+    pass
+
+
+class Pool:
+    """Keep-alive HTTP/1.1 connections to one server, at most `size` at a time."""
+
+    def __init__(self, host, port, size):
+        self.host = host
+        self.port = port
+        self.idle = []  # most recently used last, so few connections stay warm
+        self.slots = asyncio.Semaphore(size)
+        self.opened = 0
+
+    async def request(self, method, path, body=None, cookies=None):
+        """(status, body, latency in seconds); `cookies` is updated from Set-Cookie."""
+        data = b"" if body is None else json.dumps(body).encode()
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(data)}"]
+        if body is not None:
+            head.append("Content-Type: application/json")
+        if cookies:
+            head.append("Cookie: " + "; ".join(f"{name}={value}" for name, value in cookies.items()))
+        message = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data
+
+        async with self.slots:
+            retried = False
+            while True:
+                start = time.perf_counter()
+                reused = bool(self.idle) and not retried
+                if reused:
+                    reader, writer = self.idle.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                    self.opened += 1
+                try:
+                    status, headers, content = await _exchange(reader, writer, message)
+                except BaseException as e:
+                    # A connection left mid-exchange can't be reused
+                    writer.close()
+                    if reused and isinstance(e, (ConnectionError, asyncio.IncompleteReadError)):
+                        # The server dropped an idle connection, retry once on a new one
+                        retried = True
+                        continue
+                    raise
+                latency = time.perf_counter() - start
+                break
+
+        if headers.get("connection", "").lower() == "close":
+            writer.close()
+        else:
+            self.idle.append((reader, writer))
+        if cookies is not None:
+            for value in headers.get("set-cookie", ()):
+                name, _, rest = value.partition("=")
+                cookies[name.strip()] = rest.split(";", 1)[0]
+        return status, content, latency
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+
+async def _exchange(reader, writer, message):
+    writer.write(message)
+    await writer.drain()
+    line = await reader.readuntil(b"\r\n")
+    status = int(line.split(None, 2)[1])
+    headers = {}
+    while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+        name, _, value = line.decode("latin-1").partition(":")
+        name, value = name.strip().lower(), value.strip()
+        if name == "set-cookie":
+            headers.setdefault(name, []).append(value)
+        else:
+            headers[name] = value
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while size := int((await reader.readuntil(b"\r\n")).split(b";", 1)[0], 16):
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        while await reader.readuntil(b"\r\n") != b"\r\n":  # trailers
+            pass
+        content = b"".join(chunks)
+    elif "content-length" in headers:
+        content = await reader.readexactly(int(headers["content-length"]))
+    elif status in (204, 304) or status < 200:
+        content = b""
+    else:
+        content = await reader.read()
+        headers["connection"] = "close"
+    return status, headers, content
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.requests = 0
+        self.flows = 0
+        self.failed = 0
+        self.errors = {}  # message -> count
+        self.elapsed = 0.0
+
+    def percentile(self, p):
+        """Nearest-rank percentile of the timed latencies, in seconds."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+async def replay(flow, pool, names, stats):
+    cookies = {}
+    for step in flow.steps:
+        path = PREFIX + fill(step.path, names)
+        status, content, latency = await pool.request(step.method, path, fill(step.body, names), cookies)
+        stats.requests += 1
+        if step.timed:
+            stats.latencies.append(latency)
+        if not 200 <= status < 300:
+            raise FlowError(f"{step.method} {step.path}: {status} {content[:80].decode('utf-8', 'replace')}")
+
+
+async def run(flow, pool, concurrency, duration, runID, models):
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+
+    async def user(userID):
+        iteration = 0
+        while time.perf_counter() < deadline:
+            names = {
+                "user": f"load{runID}u{userID}i{iteration}",
+                "password": "load",
+                "model": random.choice(models),
+                "newModel": f"load{runID}m{userID}i{iteration}",
+            }
+            iteration += 1
+            try:
+                await replay(flow, pool, names, stats)
+                stats.flows += 1
+            except (FlowError, OSError, asyncio.IncompleteReadError) as e:
+                stats.failed += 1
+                message = str(e) or type(e).__name__
+                stats.errors[message] = stats.errors.get(message, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(userID) for userID in range(concurrency)))
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+async def seed(pool, runID):
+    """Products for the customers' carts, added by a manager of this run."""
+    names = {"user": f"load{runID}seed", "password": "load"}
+    models = [f"load{runID}p{i}" for i in range(SEED_MODELS)]
+    steps = [signUp("Manager"), logIn()]
+    for model in models:
+        body = {"model": model, "category": "Smartphone", "quantity": SEED_QUANTITY, "sellingPrice": 199.0}
+        steps.append(Step("POST", "/products", body))
+    stats = Stats()
+    await replay(Flow("Seed", "Seed", steps), pool, names, stats)
+    return models
+
+
+def report(flow, stats):
+    result = {
+        "scenario": flow.code,
+        "title": flow.title,
+        "flows": stats.flows,
+        "failed": stats.failed,
+        "requests": stats.requests,
+        "flowsPerSecond": stats.flows / stats.elapsed if stats.elapsed else 0.0,
+        "requestsPerSecond": stats.requests / stats.elapsed if stats.elapsed else 0.0,
+        "latency": {f"p{p}": stats.percentile(p) for p in (50, 95, 99)},
+        "errors": stats.errors,
+        "targets": [],
+    }
+    p99 = result["latency"]["p99"]
+    for target in flow.targets:
+        ok = p99 is not None and p99 < target.limit and not stats.failed
+        result["targets"].append({"NFR": target.name, "descr": target.descr, "limit": target.limit, "ok": ok})
+    return result
+
+
+def printReport(result):
+    def ms(seconds):
+        return "-" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+    latency = result["latency"]
+    print(f"{result['title']}")
+    print(
+        f"  {result['flows']} flows ({result['failed']} failed), {result['flowsPerSecond']:.1f} flows/s, "
+        f"{result['requestsPerSecond']:.1f} requests/s"
+    )
+    print(f"  p50 {ms(latency['p50'])}, p95 {ms(latency['p95'])}, p99 {ms(latency['p99'])}")
+    for message, count in sorted(result["errors"].items(), key=lambda item: -item[1])[:3]:
+        print(f"  {count} x {message}")
+    for target in result["targets"]:
+        print(f"  {target['NFR']} (p99 < {target['limit']:g} s): {'ok' if target['ok'] else 'FAILED'}")
+
+
+async def waitForServer(host, port, process, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if process is not None and process.poll() is not None:
+                raise SystemExit(f"The server exited with status {process.returncode}")
+            if time.monotonic() > deadline:
+                raise SystemExit(f"No server on {host}:{port} after {timeout} s")
+            await asyncio.sleep(0.2)
+
+
+async def main(args, flows):
+    url = urlsplit(args.url)
+    host, port = url.hostname or "localhost", url.port or 80
+    process = None
+    if args.start:
+        env = dict(os.environ, NODE_ENV="test")
+        # The server logs every request; that is not what is being measured
+        process = subprocess.Popen(
+            ["npx", "ts-node", "index.ts"], cwd=args.server, env=env, stdout=subprocess.DEVNULL
+        )
+    try:
+        await waitForServer(host, port, process, args.start_timeout)
+        pool = Pool(host, port, args.connections or args.concurrency)
+        runID = f"{int(time.time()) % 100000}{random.randrange(1000):03}"
+        models = await seed(pool, runID)
+        results = []
+        for flow in flows:
+            stats = await run(flow, pool, args.concurrency, args.duration, runID, models)
+            results.append(report(flow, stats))
+            if not args.json:
+                printReport(results[-1])
+        pool.close()
+        return results
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Load test the server with the use case scenarios")
+    parser.add_argument("--url", default="http://localhost:3001", help="server to load")
+    parser.add_argument("--start", action="store_true", help="start code/server first, with NODE_ENV=test")
+    parser.add_argument("--server", default=os.path.join(here, "..", "code", "server"), help="server to --start")
+    parser.add_argument("--start-timeout", type=float, default=60, help="seconds to wait for the server")
+    parser.add_argument("-c", "--concurrency", type=int, default=10, help="virtual users per scenario")
+    parser.add_argument("--connections", type=int, help="keep-alive connections (default: one per user)")
+    parser.add_argument("-d", "--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--scenario", action="append", metavar="CODE", help="only run these, e.g. 8.1 (repeatable)")
+    parser.add_argument("--list", action="store_true", help="list the scenarios with a flow")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    first = NUMBERING.number(UseCases_generator.SHARD, "UC", 1)
+    flows = [flow.resolve(UseCases_generator.UCs, first) for flow in FLOWS]
+    flows.sort(key=lambda flow: tuple(map(int, flow.code.split("."))))
+    if args.list:
+        for flow in flows:
+            print(f"{flow.code}\t{flow.title}")
+        sys.exit(0)
+    if args.scenario:
+        unknown = set(args.scenario) - {flow.code for flow in flows}
+        if unknown:
+            parser.error(f"no flow for scenario {', '.join(sorted(unknown))} (see --list)")
+        flows = [flow for flow in flows if flow.code in args.scenario]
+
+    results = asyncio.run(main(args, flows))
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    sys.exit(0 if all(target["ok"] for result in results for target in result["targets"]) else 1)
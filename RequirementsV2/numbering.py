@@ -0,0 +1,91 @@
+"""Global numbering of use cases, scenarios, NFRs and FRs across shards.
+
+RequirementsDocumentV2.md is assembled from shards: the hand-written
+base NFRs and FRs, the use cases of UseCases_generator.py and the
+extension NFRs of NFR_generator.py. Each shard declares how many items
+of each kind it adds, and numbers its own items from 1. A prefix sum
+over the shard sizes, in document order, gives every shard its offset.
+Scenario numbers are local to their use case ("Scenario 7.3"), so they
+follow from the UC number.
+
+Only the hand-written shard has literal sizes. A generated shard gives a
+function that counts its data instead, so the sizes can't drift from
+it. A shard's offset only depends on the shards before it, so the
+prefix sums are extended as far as the offsets asked for, and each size
+is counted once. Counting them all up front would import the generators
+from inside their own import. Every shard can be rendered on its own,
+and in parallel, with consistent numbering.
+
+    python numbering.py    # print the offsets
+"""
+KINDS = ("UC", "NFR", "FR")
+
+
+class Shard:
+    __slots__ = ("name", "sizes")
+
+    def __init__(self, name, **sizes):
+        unknown = set(sizes) - set(KINDS)
+        if unknown:
+            raise ValueError(f"Unknown item kind(s) for shard {name}: {', '.join(sorted(unknown))}")
+        self.name = name
+        self.sizes = sizes  # kind -> count, or a function returning it
+
+    def size(self, kind):
+        size = self.sizes.get(kind, 0)
+        return size() if callable(size) else size
+
+
+class Numbering:
+    def __init__(self, shards):
+        names = [shard.name for shard in shards]
+        if len(set(names)) != len(names):
+            raise ValueError("Shard names must be unique")
+        self.shards = shards
+        self.index = {name: i for i, name in enumerate(names)}
+        self.offsets = {kind: [0] for kind in KINDS}  # kind -> prefix sums counted so far
+
+    def offset(self, shard, kind):
+        """Items of `kind` in the shards before `shard`."""
+        if shard not in self.index:
+            raise KeyError(f"Unknown shard {shard!r}")
+        if kind not in KINDS:
+            raise KeyError(f"Unknown item kind {kind!r}")
+        i = self.index[shard]
+        offsets = self.offsets[kind]
+        while len(offsets) <= i:
+            offsets.append(offsets[-1] + self.shards[len(offsets) - 1].size(kind))
+        return offsets[i]
+
+    def number(self, shard, kind, local):
+        """Global number of the `local`-th (from 1) item of `kind` in `shard`."""
+        return self.offset(shard, kind) + local
+
+
+# The generators import this module, so their data is imported on use
+def useCases():
+    import UseCases_generator
+
+    return len(UseCases_generator.UCs)
+
+
+def extensionNFRs():
+    import NFR_generator
+
+    return len(NFR_generator.NFRs)
+
+
+# In document order
+DOCUMENT = [
+    Shard("base", NFR=10, FR=3),  # NFR1-10 and FR1-3, written by hand
+    Shard("usecases", UC=useCases),  # UseCases_generator.py
+    Shard("extension", NFR=extensionNFRs),  # NFR_generator.py, its FR references count on from the base's
+]
+
+NUMBERING = Numbering(DOCUMENT)
+
+
+if __name__ == "__main__":
+    for shard in DOCUMENT:
+        first = ", ".join(f"{kind}{NUMBERING.number(shard.name, kind, 1)}" for kind in KINDS)
+        print(f"{shard.name}: numbered from {first}")
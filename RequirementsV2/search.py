@@ -0,0 +1,339 @@
+"""Full-text search over the use cases, their scenarios and steps.
+
+    python search.py [--data FILE] [--any] [-n 10] [--json] QUERY...
+
+The index maps every token of a UseCase's name, actors and conditions,
+and of each Scenario's name, conditions and steps, to postings of
+(use case, scenario, step). Scenario 0 stands for the use case itself
+and step 0 for a name or condition. Postings are packed into one 64-bit
+int each and stored per token in an array('Q'), next to the distinct
+scenarios holding the token and its count in each.
+
+The index is pickled next to its source (".<name>.search.cache") and is
+reused without any work while the source file is unchanged. When it has
+changed, only the use cases whose content digest is new are tokenized
+again. The postings of the ones that are gone are dropped, and
+reordering use cases only renumbers them.
+
+Queries match all their tokens (any token with --any) within one
+scenario, rarest token first. Hits are ranked by tf-idf, with a bonus
+when a single step holds every token, and come with their "Scenario
+X.Y" code, anchor and matching step numbers.
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import os
+import pickle
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+import anchors
+import UseCases_generator
+from numbering import NUMBERING
+
+INDEX_VERSION = 1
+STEP_BITS = 12
+SCENARIO_BITS = 12
+UNIT_SHIFT = STEP_BITS
+SLOT_SHIFT = STEP_BITS + SCENARIO_BITS
+STEP_MASK = (1 << STEP_BITS) - 1
+SCENARIO_MASK = (1 << SCENARIO_BITS) - 1
+
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from has have in is it of on or "
+    "the this to we what when where which with".split()
+)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokens(text):
+    """'Customer adds products to the Cart' -> ['customer', 'add', 'product', 'cart']"""
+    result = []
+    for token in _TOKEN.findall(text.casefold()):
+        if token in STOPWORDS:
+            continue
+        # Crude plural folding, so that "carts" finds "cart"
+        if len(token) > 3 and token[-1] == "s" and token[-2] != "s":
+            token = token[:-1]
+        result.append(token)
+    return result
+
+
+def digest(UC):
+    return hashlib.sha1(repr(UC.key()).encode()).hexdigest()
+
+
+def fields(UC):
+    """(scenario, step, text) for everything indexed in `UC`."""
+    yield 0, 0, UC.name
+    yield 0, 0, UC.actors
+    yield 0, 0, UC.pre
+    yield 0, 0, UC.post
+    for sID, s in enumerate(UC.scenarios, 1):
+        yield sID, 0, s.name
+        yield sID, 0, s.pre
+        yield sID, 0, s.post
+        for stepNo, step in enumerate(s.steps, 1):
+            yield sID, stepNo, step
+
+
+class Term:
+    """Postings of one token, kept sorted: new slots always get higher numbers."""
+
+    __slots__ = ("postings", "units", "tfs")
+
+    def __init__(self):
+        self.postings = array("Q")  # (slot, scenario, step), one per occurrence
+        self.units = array("Q")  # distinct (slot, scenario)
+        self.tfs = array("L")  # occurrences per unit
+
+    def drop(self, slot):
+        # Each slot is one contiguous run, deleted in place
+        lo = bisect_left(self.postings, slot << SLOT_SHIFT)
+        hi = bisect_left(self.postings, (slot + 1) << SLOT_SHIFT, lo)
+        del self.postings[lo:hi]
+        lo = bisect_left(self.units, slot << SCENARIO_BITS)
+        hi = bisect_left(self.units, (slot + 1) << SCENARIO_BITS, lo)
+        del self.units[lo:hi]
+        del self.tfs[lo:hi]
+
+    def steps(self, unit):
+        """Step numbers (> 0) of `unit` holding the token."""
+        lo = bisect_left(self.postings, unit << UNIT_SHIFT)
+        hi = bisect_left(self.postings, (unit + 1) << UNIT_SHIFT, lo)
+        return {p & STEP_MASK for p in self.postings[lo:hi]} - {0}
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        self.stamp = None  # source (mtime_ns, size, UC offset) when last updated
+        self.slots = {}  # digest -> slot
+        self.slotTokens = {}  # slot -> tokens, to drop its postings
+        self.nextSlot = 0
+        self.terms = {}  # token -> Term
+        self.layout = []  # position -> slot
+        self.refs = {}  # (position, scenario) -> (code, title, anchor)
+        self.slugs = {}  # heading -> slug
+        self.units = 0  # use cases + scenarios
+
+    @classmethod
+    def open(cls, path):
+        index = cls(path)
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") == INDEX_VERSION:
+                del state["version"]
+                index.__dict__.update(state, path=path)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            pass
+        return index
+
+    def save(self):
+        state = dict(self.__dict__, version=INDEX_VERSION)
+        del state["path"]
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def update(self, UCs, stamp=None):
+        """Bring the index in line with `UCs`; returns the number of use cases re-indexed."""
+        digests = [digest(UC) for UC in UCs]
+        wanted = set(digests)
+        gone = {slot for d, slot in self.slots.items() if d not in wanted}
+        if gone:
+            self._drop(gone)
+            self.slots = {d: slot for d, slot in self.slots.items() if slot not in gone}
+
+        added = 0
+        cache = {}
+        for UC, d in zip(UCs, digests):
+            if d not in self.slots:
+                self._add(UC, d, cache)
+                added += 1
+
+        self.layout = [self.slots[d] for d in digests]
+        self.units = len(UCs) + sum(len(UC.scenarios) for UC in UCs)
+        self._refs(UCs)
+        self.stamp = stamp
+        return added
+
+    def _add(self, UC, d, cache):
+        if len(UC.scenarios) >= 1 << SCENARIO_BITS or any(len(s.steps) > STEP_MASK for s in UC.scenarios):
+            raise ValueError(f"Use case {UC.name!r} is too large to index")
+        slot = self.slots[d] = self.nextSlot
+        self.nextSlot += 1
+        found = {}  # token -> postings in this use case, in order
+        for sID, stepNo, text in fields(UC):
+            # Steps and conditions repeat a lot across scenarios
+            words = cache.get(text)
+            if words is None:
+                words = cache[text] = tokens(text)
+            posting = slot << SLOT_SHIFT | sID << UNIT_SHIFT | stepNo
+            for token in words:
+                postings = found.get(token)
+                if postings is None:
+                    found[token] = [posting]
+                else:
+                    postings.append(posting)
+
+        for token, postings in found.items():
+            term = self.terms.get(token)
+            if term is None:
+                term = self.terms[token] = Term()
+            term.postings.extend(postings)
+            for unit, tf in Counter([p >> UNIT_SHIFT for p in postings]).items():
+                term.units.append(unit)
+                term.tfs.append(tf)
+        self.slotTokens[slot] = tuple(found)
+
+    def _drop(self, slots):
+        for slot in slots:
+            for token in self.slotTokens.pop(slot):
+                term = self.terms[token]
+                term.drop(slot)
+                if not term.postings:
+                    del self.terms[token]
+
+    def _refs(self, UCs):
+        # Slugs are the expensive part of the anchors; they are kept in the
+        # index, so only new headings are slugified again
+        slugs = {}
+
+        def slug(heading):
+            result = self.slugs.get(heading)
+            if result is None:
+                result = anchors.slug(heading)
+            slugs[heading] = result
+            return result
+
+        # A private anchor pass in document order, as assignAnchors() does,
+        # so the -1/-2 suffixes match the document's
+        service = anchors.Anchors(slug)
+        first = NUMBERING.offset(UseCases_generator.SHARD, "UC")
+        self.refs = {}
+        for position, UC in enumerate(UCs):
+            index = position + 1 + first
+            self.refs[(position, 0)] = (f"UC{index}", UC.fullName(index), UC.anchor(index, service))
+            for sID, s in enumerate(UC.scenarios, 1):
+                ref = (s.code(index, sID), s.fullName(index, sID), s.anchor(index, sID, service))
+                self.refs[(position, sID)] = ref
+        self.slugs = slugs
+
+    def search(self, query, limit=10, matchAll=True):
+        """Ranked hits for `query`: dicts with code, title, anchor, score and steps."""
+        found = [self.terms.get(token) for token in dict.fromkeys(tokens(query))]
+        if matchAll and not all(found):
+            return []
+        found = sorted((term for term in found if term), key=lambda term: len(term.units))
+        if not found:
+            return []
+
+        # Rarest term first, so an AND query only ever scores its candidates
+        scores = {}
+        for term in found:
+            idf = math.log(1 + self.units / len(term.units))
+            if matchAll and scores:
+                tfs = dict(zip(term.units, term.tfs))
+                scores = {u: s + idf * (1 + math.log(tfs[u])) for u, s in scores.items() if u in tfs}
+                if not scores:
+                    return []
+            else:
+                for u, tf in zip(term.units, term.tfs):
+                    scores[u] = scores.get(u, 0.0) + idf * (1 + math.log(tf))
+
+        # Step details, and the bonus for a step holding every term, are
+        # only worked out for the best candidates
+        bonus = sum(math.log(1 + self.units / len(term.units)) for term in found)
+        positions = {}
+        for position, slot in enumerate(self.layout):
+            positions.setdefault(slot, []).append(position)
+
+        def order(unit):
+            # Ties in document order
+            return (positions[unit >> SCENARIO_BITS][0], unit & SCENARIO_MASK)
+
+        ranked = []
+        candidates = heapq.nsmallest(limit * 4, scores, key=lambda unit: (-scores[unit], order(unit)))
+        for unit in candidates:
+            score = scores[unit]
+            perStep = Counter()
+            for term in found:
+                perStep.update(term.steps(unit))
+            best = max(perStep.values(), default=0)
+            if best == len(found):
+                score += bonus
+            ranked.append((score, unit, sorted(step for step, n in perStep.items() if n == best)))
+        ranked.sort(key=lambda hit: (-hit[0], order(hit[1])))
+
+        hits = []
+        for score, unit, steps in ranked:
+            slot, sID = unit >> SCENARIO_BITS, unit & SCENARIO_MASK
+            for position in positions[slot]:
+                code, title, anchor = self.refs[(position, sID)]
+                hits.append({"code": code, "title": title, "anchor": anchor, "score": round(score, 3), "steps": steps})
+            if len(hits) >= limit:
+                break
+        return hits[:limit]
+
+
+def indexPath(source):
+    head, tail = os.path.split(source)
+    return os.path.join(head, f".{os.path.splitext(tail)[0]}.search.cache")
+
+
+def openIndex(data=None, rebuild=False):
+    """The index of `data` (default: the built-in UCs), updated if its source changed."""
+    source = data or UseCases_generator.__file__
+    st = os.stat(source)
+    # Renumbering changes every code and anchor, so it invalidates the index too
+    stamp = (st.st_mtime_ns, st.st_size, NUMBERING.offset(UseCases_generator.SHARD, "UC"))
+    path = indexPath(source)
+    index = SearchIndex(path) if rebuild else SearchIndex.open(path)
+    if index.stamp != stamp:
+        if data:
+            from loader import loadUseCases
+
+            UCs = loadUseCases(data)
+        else:
+            UCs = UseCases_generator.UCs
+        index.update(UCs, stamp)
+        index.save()
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the use cases and scenarios")
+    parser.add_argument("query", nargs="+")
+    parser.add_argument("--data", help="search a JSON/YAML/TOML data file instead of UCs")
+    parser.add_argument("--any", action="store_true", help="match any query word instead of all of them")
+    parser.add_argument("-n", "--limit", type=int, default=10, help="maximum number of hits")
+    parser.add_argument("--json", action="store_true", help="print the hits as JSON")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index from scratch")
+    args = parser.parse_args(argv)
+
+    index = openIndex(args.data, args.rebuild)
+    hits = index.search(" ".join(args.query), args.limit, not args.any)
+    if args.json:
+        json.dump(hits, sys.stdout, indent=2)
+        print()
+        return
+    for hit in hits:
+        steps = f" (step {', '.join(map(str, hit['steps']))})" if hit["steps"] else ""
+        print(f"{hit['score']:7.2f}  [{hit['title']}](#{hit['anchor']}){steps}")
+
+
+if __name__ == "__main__":
+    # Run through the importable module so that the pickled index refers
+    # to search.Term rather than __main__.Term
+    import search
+
+    search.main()
@@ -0,0 +1,134 @@
+"""Shared step prefixes of the scenarios of a use case.
+
+Scenarios of one use case tend to start the same way, with the exception
+scenarios diverging from the nominal one after a few steps. A StepTrie
+holds the step sequences of the scenarios, each distinct prefix once.
+The steps passed through by more than one scenario are the common steps.
+They can be rendered once per use case, so that each scenario only lists
+the steps where it diverges (UseCases_generator.py --common-steps).
+
+Steps are interned strings, so a Scenario's step tuple costs one pointer
+per step, less than a trie node. The trie refers to those tuples instead
+of replacing them. It is built once per use case, on first render, and
+only the shared runs and common step counts are kept
+(UseCase.stepSharing()). The common step table rendered from them is
+kept too (UseCase.commonStepTable()).
+
+    python steptrie.py [--data FILE]    # print the sharing per use case
+"""
+import argparse
+
+
+class StepNode:
+    """An edge of steps[start:end], shared by `scenarios` (numbered from 1)."""
+
+    __slots__ = ("steps", "start", "end", "children", "scenarios")
+
+    def __init__(self, steps, start, end, scenarios):
+        self.steps = steps  # the step tuple of the scenario that added the edge
+        self.start = start
+        self.end = end  # also the depth of the node
+        self.children = None  # first step -> StepNode, only once there is one
+        self.scenarios = scenarios
+
+
+class StepTrie:
+    """A radix trie: each node holds a run of steps, split only where scenarios diverge.
+
+    Following a run that matches costs one tuple comparison, so a
+    scenario is inserted in time proportional to the branches on its
+    path, rather than to its number of steps.
+    """
+
+    def __init__(self, scenarios=()):
+        self.root = StepNode((), 0, 0, [])
+        self.commons = []  # scenario number - 1 -> leading steps shared with another
+        self.size = 0  # distinct prefixes, i.e. steps stored once
+        self.total = 0  # steps over all scenarios
+        for steps in scenarios:
+            self.insert(steps)
+
+    def insert(self, steps):
+        """Add the next scenario's steps; returns its scenario number."""
+        self.commons.append(0)
+        number = len(self.commons)
+        self.total += len(steps)
+        node = self.root
+        pos = 0
+        while pos < len(steps):
+            child = node.children and node.children.get(steps[pos])
+            if not child:
+                if node.children is None:
+                    node.children = {}
+                node.children[steps[pos]] = StepNode(steps, pos, len(steps), [number])
+                self.size += len(steps) - pos
+                break
+            length = child.end - child.start
+            if steps[pos : pos + length] != child.steps[child.start : child.end]:
+                # Diverges within the run (or stops short of its end): split it
+                matched = 1
+                while pos + matched < len(steps) and steps[pos + matched] == child.steps[child.start + matched]:
+                    matched += 1
+                child = self._split(node, child, matched)
+                length = matched
+            child.scenarios.append(number)
+            node = child
+            pos += length
+
+        # The scenarios that got this far now share `pos` steps with this one
+        self.commons[-1] = pos
+        if pos:
+            for other in node.scenarios[:-1]:
+                if self.commons[other - 1] < pos:
+                    self.commons[other - 1] = pos
+        return number
+
+    def _split(self, parent, child, length):
+        head = StepNode(child.steps, child.start, child.start + length, list(child.scenarios))
+        child.start += length
+        head.children = {child.steps[child.start]: child}
+        parent.children[head.steps[head.start]] = head
+        return head
+
+    def shared(self):
+        """(first step number, steps, scenarios) for each run of steps on the
+        path of more than one scenario, depth first in insertion order."""
+        stack = list(reversed(self.root.children.values())) if self.root.children else []
+        while stack:
+            node = stack.pop()
+            if len(node.scenarios) < 2:
+                continue
+            yield node.start + 1, node.steps[node.start : node.end], node.scenarios
+            if node.children:
+                stack.extend(reversed(node.children.values()))
+
+    def common(self, number):
+        """How many leading steps scenario `number` shares with another scenario."""
+        return self.commons[number - 1]
+
+    def steps(self):
+        """Steps stored in the trie, against the sum over the scenarios."""
+        return self.size, self.total
+
+
+if __name__ == "__main__":
+    import UseCases_generator
+
+    parser = argparse.ArgumentParser(description="Show how many steps the scenarios of each use case share")
+    parser.add_argument("--data", help="read a JSON/YAML/TOML data file instead of UCs")
+    args = parser.parse_args()
+
+    UCs = UseCases_generator.UCs
+    if args.data:
+        from loader import loadUseCases
+
+        UCs = loadUseCases(args.data)
+    total = stored = 0
+    for ucID, UC in enumerate(UCs, 1):
+        trie = StepTrie(s.steps for s in UC.scenarios)
+        nodes, steps = trie.steps()
+        total += steps
+        stored += nodes
+        print(f"UC{ucID}: {len(UC.scenarios)} scenarios, {steps} steps, {nodes} distinct prefixes")
+    if total:
+        print(f"total: {stored}/{total} steps stored ({1 - stored / total:.0%} shared)")
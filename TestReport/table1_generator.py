@@ -1,9 +1,40 @@
-import csv
-
-with open('table1.csv', newline='') as csvfile:
-    spamreader = csv.reader(csvfile, delimiter=',', quotechar='"')
-    with open("table1.md", "w") as out:
-        out.write("| Test case name | Object(s) tested | Test level | Technique used |\n")
-        out.write("| :------------- | :--------------- | :--------: | :------------: |\n")
-        for row in spamreader:
-            out.write(f"| {' | '.join(row)} |\n")
+import argparse
+
+import docgenpath  # noqa: F401
+from csvstream import read_path
+from docgen import instrument
+from docgen.output import open_output
+from docgen.splice import splice
+from tables import BACKENDS, CENTER, Column, Table, render
+
+TABLE1 = Table(
+    [
+        Column("Test case name"),
+        Column("Object(s) tested"),
+        Column("Test level", CENTER),
+        Column("Technique used", CENTER),
+    ]
+)
+
+
+def table1(src, dst, format="markdown"):
+    with open_output(dst) as out, instrument.phase("render"):
+        rows = instrument.iterate("load", read_path(src), "rows")
+        return render(TABLE1, rows, instrument.writer(out), format)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render table1.csv as a Markdown table")
+    parser.add_argument("input", nargs="?", default="table1.csv", help="CSV file, '-' for stdin")
+    parser.add_argument("output", nargs="?", default="table1.md", help="output file, '-' for stdout")
+    parser.add_argument("-f", "--format", choices=BACKENDS, default="markdown", help="output format")
+    parser.add_argument("--profile", help="write a JSON timing report (or a .prof cProfile dump)")
+    parser.add_argument("--splice", metavar="DOCUMENT", help="also copy the output into the table1 region of DOCUMENT")
+    args = parser.parse_args()
+    if args.splice and args.output == "-":
+        parser.error("--splice needs an output file")
+    with instrument.session("table1", args.profile):
+        table1(args.input, args.output, args.format)
+        if args.splice:
+            with open(args.output, "rb") as f, instrument.phase("splice"):
+                splice(args.splice, {"table1": f})
@@ -1,33 +1,60 @@
-import csv
-
-with open('table2.csv', newline='') as csvfile:
-    spamreader = csv.reader(csvfile, delimiter=',', quotechar='"')
-    with open("table2.md", "w") as out:
-        
-        out.write("<table>\n")
-        out.write("\t<thead>\n")
-        out.write("\t\t<tr>\n")
-        out.write("\t\t\t<th>Functional Requirement or scenario</th>\n")
-        out.write("\t\t\t<th>Test(s)</th>\n")
-        out.write("\t\t</tr>\n")
-        out.write("\t</thead>\n")
-        out.write("\t<tbody style='font-family:\"Courier New\"'>\n")
-        
-        for row in spamreader:
-            out.write("\t\t<tr>\n")
-            out.write(f"\t\t\t<td>{row[0]}</td>\n")
-            
-            if len(row[1]) != 0: 
-                out.write("\t\t\t<td>\n")
-                out.write("\t\t\t\t<ul>\n")
-                
-                for test in row[1].split("\n"):
-                    out.write(f"\t\t\t\t\t<li>{test}</li>\n")
-                
-                out.write("\t\t\t\t</ul>\n")
-                out.write("\t\t\t</td>\n")
-            else:
-                out.write("\t\t\t<td>-</td>\n")
-                    
-            out.write("\t\t</tr>\n")
-        out.write("\t</tbody>\n")
+import argparse
+
+import docgenpath  # noqa: F401
+from csvstream import read_path
+from docgen import instrument
+from docgen.output import open_output
+from docgen.splice import splice
+from tables import BACKENDS, LIST, Column, Table, render
+from testcoverage import load
+
+TABLE2 = Table(
+    [
+        Column("Functional Requirement or scenario"),
+        Column("Test(s)", kind=LIST),
+    ],
+    bodyStyle='font-family:"Courier New"',
+)
+TABLE2_COVERAGE = Table(TABLE2.columns + [Column("Coverage")], TABLE2.bodyStyle)
+
+
+def withCoverage(rows, coverage):
+    for row, total in coverage.attribute(rows):
+        if row:
+            row = row + [""] * (2 - len(row)) + [total.summary() if total else "-"]
+        yield row
+
+
+def table2(src, dst, format="html", coverage=None):
+    """`coverage`, a testcoverage.Coverage, adds the coverage of each FR's tested modules."""
+    table = TABLE2
+    with open_output(dst) as out, instrument.phase("render"):
+        rows = instrument.iterate("load", read_path(src), "rows")
+        if coverage is not None:
+            table = TABLE2_COVERAGE
+            rows = withCoverage(rows, coverage)
+        return render(table, rows, instrument.writer(out), format)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render table2.csv as an HTML table")
+    parser.add_argument("input", nargs="?", default="table2.csv", help="CSV file, '-' for stdin")
+    parser.add_argument("output", nargs="?", default="table2.md", help="output file, '-' for stdout")
+    parser.add_argument("-f", "--format", choices=BACKENDS, default="html", help="output format")
+    parser.add_argument("--profile", help="write a JSON timing report (or a .prof cProfile dump)")
+    parser.add_argument("--splice", metavar="DOCUMENT", help="also copy the output into the table2 region of DOCUMENT")
+    parser.add_argument(
+        "--coverage", metavar="REPORT", help="add a Coverage column from a Jest lcov.info or coverage-final.json"
+    )
+    args = parser.parse_args()
+    if args.splice and args.output == "-":
+        parser.error("--splice needs an output file")
+    with instrument.session("table2", args.profile):
+        coverage = None
+        if args.coverage:
+            with instrument.phase("coverage"):
+                coverage = load(args.coverage)
+        table2(args.input, args.output, args.format, coverage)
+        if args.splice:
+            with open(args.output, "rb") as f, instrument.phase("splice"):
+                splice(args.splice, {"table2": f})
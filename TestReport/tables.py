@@ -0,0 +1,214 @@
+"""Table schema and output backends shared by the TestReport generators.
+
+A Table describes the columns. CSV rows are turned into cell values
+(text, or a list of lines for LIST columns), and a backend renders them.
+Adding an output format only means adding a backend to BACKENDS.
+
+Rows are rendered in batches. The Markdown backend joins a batch with
+two str.join calls, and the HTML backend renders it a column at a time
+with one f-string per column. Whether any cell needs escaping is checked
+once per batch, with a few scans of the joined text in C. A batch that
+does, which is rare, goes through the per-cell renderer instead. The
+output is the same either way.
+"""
+import json
+from itertools import islice
+from operator import itemgetter
+
+from csvstream import BATCH_ROWS
+
+LEFT, CENTER, RIGHT = "left", "center", "right"
+TEXT, LIST = "text", "list"
+
+
+class Column:
+    __slots__ = ("title", "align", "kind")
+
+    def __init__(self, title, align=LEFT, kind=TEXT):
+        self.title = title
+        self.align = align
+        self.kind = kind
+
+
+def _splitLines(value):
+    lines = value.split("\n")
+    if "" in lines:
+        lines = [line for line in lines if line]
+    return lines
+
+
+class Table:
+    def __init__(self, columns, bodyStyle=None):
+        self.columns = columns
+        self.bodyStyle = bodyStyle
+        self.lists = [i for i, column in enumerate(columns) if column.kind == LIST]
+
+    def cells(self, row):
+        """A CSV row -> cell values; LIST cells become lists of non-empty lines.
+
+        Rows are fresh lists from the CSV reader, so they are updated in place.
+        """
+        for i in self.lists:
+            if i < len(row):
+                row[i] = _splitLines(row[i])
+        return row
+
+
+class Markdown:
+    ESCAPE = str.maketrans({"|": "\\|", "<": "&lt;", "&": "&amp;", "\n": "<br>"})
+    RULE = {LEFT: ":{}", CENTER: ":{}:", RIGHT: "{}:"}
+
+    def header(self, table):
+        titles = " | ".join(column.title for column in table.columns)
+        rules = []
+        for column in table.columns:
+            rule = self.RULE[column.align]
+            rules.append(rule.format("-" * (len(column.title) - len(rule) + 2)))
+        return f"| {titles} |\n| {' | '.join(rules)} |\n"
+
+    def row(self, table):
+        escape = self.ESCAPE
+
+        def cell(value):
+            if isinstance(value, list):
+                return "<br>".join([line.translate(escape) for line in value]) or "-"
+            return value.translate(escape)
+
+        return lambda row: f"| {' | '.join([cell(value) for value in table.cells(row)])} |\n"
+
+    def rows(self, table):
+        row = self.row(table)
+        if table.lists:
+            return lambda batch: "".join(map(row, batch))
+
+        def render(batch):
+            # Rows are joined on a stand-in for the line end. Then the line
+            # ends left are the cells' own, and if the pipes and stand-ins
+            # are only the table's, no cell holds one.
+            text = " |\x1e| ".join(map(" | ".join, batch))
+            if (
+                "<" in text
+                or "&" in text
+                or text.count("|") != sum(map(len, batch)) + len(batch) - 2
+                or text.count("\x1e") != len(batch) - 1
+            ):
+                return "".join(map(row, batch))
+            if "\n" in text:
+                text = text.replace("\n", "<br>")
+            return "| " + text.replace("\x1e", "\n") + " |\n"
+
+        return render
+
+    def footer(self, table):
+        return ""
+
+
+class HTML:
+    ESCAPE = str.maketrans({"<": "&lt;", "&": "&amp;"})
+    ITEM = "</li>\n\t\t\t\t\t<li>"
+    EMPTY = "\t\t\t<td>-</td>\n"
+
+    def header(self, table):
+        style = f" style='{table.bodyStyle}'" if table.bodyStyle else ""
+        titles = "".join(f"\t\t\t<th>{column.title}</th>\n" for column in table.columns)
+        return f"<table>\n\t<thead>\n\t\t<tr>\n{titles}\t\t</tr>\n\t</thead>\n\t<tbody{style}>\n"
+
+    def items(self, values):
+        lis = self.ITEM.join(values)
+        return f"\t\t\t<td>\n\t\t\t\t<ul>\n\t\t\t\t\t<li>{lis}</li>\n\t\t\t\t</ul>\n\t\t\t</td>\n"
+
+    def row(self, table):
+        escape = self.ESCAPE
+        n = len(table.columns)
+
+        def cell(value):
+            if isinstance(value, list):
+                return self.items([line.translate(escape) for line in value]) if value else self.EMPTY
+            return f"\t\t\t<td>{value.translate(escape)}</td>\n"
+
+        def render(row):
+            # Cells past the last column are dropped
+            cells = "".join([cell(value) for value in table.cells(row)[:n]])
+            return f"\t\t<tr>\n{cells}\t\t</tr>\n"
+
+        return render
+
+    def rows(self, table):
+        row = self.row(table)
+        n = len(table.columns)
+        item, newline = self.ITEM, "\n"
+        listOpen, listClose = self.items(["\0"]).split("\0")
+        # The first and last column also carry the <tr> tags
+        opens = ["\t\t<tr>\n"] + [""] * (n - 1)
+        closes = [""] * (n - 1) + ["\t\t</tr>\n"]
+
+        def render(batch):
+            if set(map(len, batch)) != {n}:
+                return "".join(map(row, batch))
+            cells = [None] * (n * len(batch))
+            for i, column in enumerate(table.columns):
+                values = list(map(itemgetter(i), batch))
+                first, last = opens[i], closes[i]
+                if column.kind == LIST:
+                    # A blank line, also at either end of a cell, makes a
+                    # "\n\n" or an end "\n" here
+                    text = "\n".join(filter(None, values))
+                    if "\n\n" in text or text[:1] == "\n" or text[-1:] == "\n" or "<" in text or "&" in text:
+                        return "".join(map(row, batch))
+                    empty = f"{first}{self.EMPTY}{last}"
+                    cells[i::n] = [
+                        f"{first}{listOpen}{value.replace(newline, item)}{listClose}{last}" if value else empty
+                        for value in values
+                    ]
+                else:
+                    text = "".join(values)
+                    if "<" in text or "&" in text:
+                        return "".join(map(row, batch))
+                    cells[i::n] = [f"{first}\t\t\t<td>{value}</td>\n{last}" for value in values]
+            return "".join(cells)
+
+        return render
+
+    def footer(self, table):
+        return "\t</tbody>\n</table>\n"
+
+
+class JSON:
+    def header(self, table):
+        self.first = True
+        return "[\n"
+
+    def row(self, table):
+        titles = [column.title for column in table.columns]
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+
+        def render(row):
+            prefix = "  " if self.first else ",\n  "
+            self.first = False
+            return prefix + encode(dict(zip(titles, table.cells(row))))
+
+        return render
+
+    def rows(self, table):
+        row = self.row(table)
+        return lambda batch: "".join(map(row, batch))
+
+    def footer(self, table):
+        return "\n]\n"
+
+
+BACKENDS = {"markdown": Markdown, "html": HTML, "json": JSON}
+
+
+def render(table, rows, out, format):
+    """Write the CSV `rows` as `table` in `format`; returns the number of rows."""
+    backend = BACKENDS[format]()
+    renderRows = backend.rows(table)
+    out.write(backend.header(table))
+    rows = iter(rows)
+    count = 0
+    while batch := list(islice(rows, BATCH_ROWS)):
+        out.write(renderRows(batch))
+        count += len(batch)
+    out.write(backend.footer(table))
+    return count
@@ -0,0 +1,273 @@
+"""Regenerate table1.csv from the describe/test titles of the Jest suites.
+
+    python testnames.py [-o table1.csv] [--server ../code/server] [-j 8] [--check]
+
+The test directories of code/server give the level of their tests:
+test_unit -> Unit, test_integration -> Integration, test_official ->
+API. Every *.test.ts file under them is scanned with one regular
+expression for comments, string literals, parentheses and
+describe/test/it calls with a literal title. The call nesting gives the
+full name, "ProductRoutes + ProductController > \"POST /\" > Missing
+field". Files are scanned by a thread pool, in order of path.
+
+Scan results are cached per file in ".table1.scan.cache" under the
+file's size, mtime and SHA-1. A file whose size and mtime are unchanged
+is not even opened, and a touched file whose content is unchanged is
+read and hashed but not scanned again. A warm run only costs a stat()
+per test file.
+
+The object tested and the technique of a test can't be read from its
+title, so they are carried over from the current table1.csv. A row
+naming a test is kept for it. A "... > *" row is kept, once, for all
+the tests under it. A new test gets a row with those cells left blank,
+and rows that match no test are dropped, and counted on stderr. The
+table is printed unless -o names the file to update.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import os
+import pickle
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import docgenpath  # noqa: F401
+from csvstream import read_path
+from docgen.output import open_output
+from traceability import normalize
+
+LEVELS = {"test_unit": "Unit", "test_integration": "Integration", "test_official": "API"}
+CACHE_FILE = ".table1.scan.cache"
+CACHE_VERSION = 1
+
+_STRING = r"""'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*"|`(?:[^`\\]|\\.)*`"""
+_TOKEN = re.compile(
+    rf"""//[^\n]*|/\*.*?\*/"""
+    rf"""|\b(describe|test|it)(?:\.(?:only|skip|concurrent|failing))*\s*\(\s*({_STRING})"""
+    rf"""|{_STRING}|([()])""",
+    re.S,
+)
+_ESCAPE = re.compile(r"\\(.)", re.S)
+
+
+def title(literal):
+    """'" POST /"' or "'it\\'s'" -> the string's value, stripped"""
+    return _ESCAPE.sub(r"\1", literal[1:-1]).strip()
+
+
+def scan(text):
+    """Full names of the tests in a test file, "describe > ... > test", in order."""
+    names = []
+    describes = []  # (paren depth of the call, title)
+    depth = 0
+    for match in _TOKEN.finditer(text):
+        kind, literal, paren = match.groups()
+        if kind is not None:
+            depth += 1
+            if kind == "describe":
+                describes.append((depth, title(literal)))
+            else:
+                names.append(" > ".join([name for _, name in describes] + [title(literal)]))
+        elif paren == "(":
+            depth += 1
+        elif paren == ")":
+            if describes and describes[-1][0] == depth:
+                describes.pop()
+            depth -= 1
+    return names
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class ScanCache:
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        # test file -> (size, mtime_ns, sha1, names joined with NULs); one
+        # string per file keeps the cache quick to load
+        self.entries = {}
+        self.outputs = {}  # table -> (inputs key, previous table stamp, table stamp)
+        self.saved = {}
+        self.used = {}
+        self.scanned = 0
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") == CACHE_VERSION:
+                self.entries = state["entries"]
+                self.outputs = state["outputs"]
+                self.saved = dict(self.outputs)
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError):
+            pass
+
+    def digest(self, path):
+        """SHA-1 of a test file, scanning it if it changed."""
+        stamp = _stamp(path)
+        entry = self.entries.get(path)
+        if entry is not None and entry[:2] == stamp:
+            self.used[path] = entry
+            return entry[2]
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        if entry is not None and entry[2] == digest:
+            names = entry[3]
+        else:
+            names = "\0".join(scan(data.decode("utf-8")))
+            self.scanned += 1
+        self.used[path] = stamp + (digest, names)
+        return digest
+
+    def names(self, path):
+        names = self.used[path][3]
+        return names.split("\0") if names else []
+
+    def save(self):
+        # Only files seen by this run are kept, so deleted ones don't pile up
+        if self.used == self.entries and self.outputs == self.saved:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            state = {"version": CACHE_VERSION, "entries": self.used, "outputs": self.outputs}
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+
+def testFiles(server):
+    """(level, path) of the *.test.ts files of each test directory, sorted by path."""
+    for directory, level in LEVELS.items():
+        paths = []
+        stack = [os.path.join(server, directory)]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.name.endswith(".test.ts"):
+                    paths.append(entry.path)
+        for path in sorted(paths):
+            yield level, path
+
+
+def scanFiles(server, cache, jobs=None):
+    """(level, path, sha1) of every test file, scanning the ones that changed."""
+    files = list(testFiles(server))
+    with ThreadPoolExecutor(jobs) as pool:
+        # map() yields results in submission order, so the file order is kept
+        digests = pool.map(cache.digest, [path for _, path in files])
+        return [(level, path, digest) for (level, path), digest in zip(files, digests)]
+
+
+def tests(files, cache):
+    """(level, test name) of every test of `files`, in order."""
+    return [(level, name) for level, path, _ in files for name in cache.names(path)]
+
+
+def _index(previous):
+    exact = {}
+    groups = {}
+    for i, row in enumerate(previous):
+        if row:
+            segments, wildcard = normalize(row[0])
+            (groups if wildcard else exact).setdefault(segments, i)
+    return exact, groups
+
+
+def rows(tests, previous, used=None):
+    """table1.csv rows for `tests`, reusing the matching `previous` rows.
+
+    The indexes of the previous rows reused are added to `used`.
+    """
+    byName = {}
+    for i, row in enumerate(previous):
+        if row and row[0] not in byName:
+            byName[row[0]] = i
+    exact = groups = None
+    used = set() if used is None else used
+    seen = set()  # names, and normalized names, of the tests so far
+    for level, name in tests:
+        # Jest allows duplicate titles, the table can't tell them apart
+        if name in seen:
+            continue
+        seen.add(name)
+        # Most tests keep their row as is, only the others are normalized
+        i = byName.get(name)
+        if i is None:
+            if exact is None:
+                exact, groups = _index(previous)
+            segments, _ = normalize(name)
+            if segments in seen:
+                continue
+            seen.add(segments)
+            i = exact.get(segments)
+            # Or the innermost "... > *" row enclosing the test
+            end = len(segments) - 1
+            while i is None and end > 0:
+                i = groups.get(segments[:end])
+                end -= 1
+        if i is None:
+            yield [name, "", level, ""]
+            continue
+        if i in used:
+            continue
+        used.add(i)
+        row = previous[i]
+        yield [row[0], row[1] if len(row) > 1 else "", level, row[3] if len(row) > 3 else ""]
+
+
+def table1csv(tests, previous, used=None):
+    out = io.StringIO()
+    csv.writer(out, lineterminator="\n").writerows(rows(tests, previous, used))
+    return out.getvalue()
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Regenerate table1.csv from the Jest test titles")
+    parser.add_argument("-o", "--output", default="-", help="CSV file to update (default: print the table)")
+    parser.add_argument("--previous", help="table to take the other columns from (default: the output, or table1.csv)")
+    parser.add_argument("--server", default=os.path.join(here, "..", "code", "server"), help="the Jest project")
+    parser.add_argument("-j", "--jobs", type=int, help="scanner threads (default: Python's choice)")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if the output is out of date")
+    args = parser.parse_args()
+    if args.check and args.output == "-":
+        parser.error("--check needs an output file")
+
+    cache = ScanCache(os.path.join(here, CACHE_FILE))
+    files = scanFiles(args.server, cache, args.jobs)
+    source = args.previous or (args.output if args.output != "-" else os.path.join(here, "table1.csv"))
+
+    # Nothing to do if neither the test files nor the tables changed since
+    # this table was last written
+    output = os.path.abspath(args.output)
+    key = hashlib.sha1(repr((files, os.path.abspath(source))).encode()).hexdigest()
+    upToDate = cache.outputs.get(output) == (key, _stamp(source), _stamp(output))
+    if upToDate and args.output != "-":
+        cache.save()
+        print(f"{args.output}: up to date", file=sys.stderr)
+        sys.exit(0)
+
+    previous = list(read_path(source)) if os.path.exists(source) else []
+    used = set()
+    text = table1csv(tests(files, cache), previous, used)
+    dropped = sum(1 for row in previous if row) - len(used)
+    print(f"{cache.scanned} files scanned, {dropped} rows of {source} dropped", file=sys.stderr)
+
+    if args.check:
+        with open(args.output, newline="") as f:
+            sys.exit(0 if f.read() == text else f"{args.output} is out of date, run testnames.py -o {args.output}")
+    with open_output(args.output) as out:
+        out.write(text)
+    if args.output != "-":
+        cache.outputs[output] = (key, _stamp(source), _stamp(output))
+    cache.save()
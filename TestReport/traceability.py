@@ -0,0 +1,151 @@
+"""Cross-check the test cases in table1.csv against the FR mapping in table2.csv.
+
+    python traceability.py [table1.csv] [table2.csv] [--json] [--strict]
+
+Test names are compared segment by segment ("A > B > c"), ignoring case,
+quotes and repeated spaces. A trailing "*" in either table stands for a
+whole group of tests. Test names go into a prefix trie, so every
+reference is resolved with one walk down the trie, and a final traversal
+marks the tests covered by wildcard references. The whole check runs in
+O(n + m) segments.
+
+Reported problems:
+  - unmapped tests: tests in table1.csv that no FR refers to
+  - untested FRs: rows of table2.csv with no tests
+  - dangling references: table2.csv tests that match nothing in table1.csv
+"""
+import argparse
+import json
+import sys
+
+from csvstream import read_path
+
+
+def normalize(name):
+    """'userRoutes >  GET /users > *' -> (('userroutes', 'get /users'), True)"""
+    segments = [" ".join(part.split()) for part in name.replace('"', "").casefold().split(">")]
+    wildcard = segments[-1] == "*"
+    if wildcard:
+        segments.pop()
+    return tuple(segment for segment in segments if segment), wildcard
+
+
+class Node:
+    __slots__ = ("children", "tests", "groups", "size", "hit", "groupHit", "subtreeHit")
+
+    def __init__(self):
+        self.children = {}
+        self.tests = []  # tests whose name ends here
+        self.groups = []  # "... > *" tests whose prefix ends here
+        self.size = 0  # tests in this subtree
+        self.hit = False
+        self.groupHit = False
+        self.subtreeHit = False
+
+
+class TestTrie:
+    def __init__(self, names):
+        self.names = names
+        self.root = Node()
+        for i, name in enumerate(names):
+            segments, wildcard = normalize(name)
+            node = self.root
+            for segment in segments:
+                child = node.children.get(segment)
+                if child is None:
+                    child = node.children[segment] = Node()
+                node = child
+            (node.groups if wildcard else node.tests).append(i)
+
+        # Subtree sizes, children before parents
+        for node in reversed(list(self.nodes())):
+            node.size = len(node.tests) + len(node.groups) + sum(c.size for c in node.children.values())
+
+    def nodes(self):
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children.values())
+
+    def resolve(self, name):
+        """Mark the tests matched by a table2 reference; False if it is dangling."""
+        segments, wildcard = normalize(name)
+        matched = False
+        node = self.root
+        for segment in segments:
+            if node.groups:
+                # A "... > *" test group encloses the referenced test
+                node.groupHit = matched = True
+            node = node.children.get(segment)
+            if node is None:
+                return matched
+
+        if node.groups:
+            node.groupHit = matched = True
+        if wildcard and node.size:
+            node.subtreeHit = matched = True
+        elif node.tests:
+            node.hit = matched = True
+        return matched
+
+    def unmapped(self):
+        mapped = [False] * len(self.names)
+        stack = [(self.root, False)]
+        while stack:
+            node, covered = stack.pop()
+            covered = covered or node.subtreeHit
+            for i in node.tests:
+                mapped[i] = covered or node.hit
+            for i in node.groups:
+                mapped[i] = covered or node.groupHit
+            stack.extend((child, covered) for child in node.children.values())
+        return [name for name, ok in zip(self.names, mapped) if not ok]
+
+
+def check(table1, table2):
+    trie = TestTrie([row[0] for row in read_path(table1) if row])
+
+    untested = []
+    dangling = []
+    for row in read_path(table2):
+        if not row:
+            continue
+        FR = row[0]
+        tests = [test for test in (row[1] if len(row) > 1 else "").split("\n") if test.strip()]
+        if not tests:
+            untested.append(FR)
+        for test in tests:
+            if not trie.resolve(test):
+                dangling.append({"FR": FR, "test": test.strip()})
+
+    return {
+        "unmapped_tests": trie.unmapped(),
+        "untested_FRs": untested,
+        "dangling_references": dangling,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check table1.csv against table2.csv")
+    parser.add_argument("table1", nargs="?", default="table1.csv")
+    parser.add_argument("table2", nargs="?", default="table2.csv")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 if anything is reported")
+    args = parser.parse_args()
+
+    report = check(args.table1, args.table2)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        for title, key in (
+            ("Tests not mapped to any FR", "unmapped_tests"),
+            ("FRs without tests", "untested_FRs"),
+            ("Dangling references", "dangling_references"),
+        ):
+            print(f"{title} ({len(report[key])}):")
+            for item in report[key]:
+                print(f"  {item['FR']}: {item['test']}" if isinstance(item, dict) else f"  {item}")
+    if args.strict and any(report.values()):
+        sys.exit(1)
@@ -0,0 +1,15 @@
+"""Tooling around the RequirementsV2 and TestReport document generators.
+
+The generators are standalone scripts run from their own directories, so
+this package puts those directories on sys.path before importing them.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUIREMENTS = os.path.join(ROOT, "RequirementsV2")
+TESTREPORT = os.path.join(ROOT, "TestReport")
+
+for path in (REQUIREMENTS, TESTREPORT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,243 @@
+"""End-to-end and per-phase benchmarks for the four document generators.
+
+    python -m docgen.benchmark                 # run and compare with the baseline
+    python -m docgen.benchmark --save          # run and record a new baseline
+    python -m docgen.benchmark --ucs 500 --threshold 0.25
+
+Inputs are synthesized at the requested size, and the sizes are saved
+with the baseline. A run exits with status 1 when any generator's
+throughput drops more than --threshold below the baseline, and with
+status 2, without comparing, when the baseline was recorded at other
+sizes.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from docgen import ROOT
+
+import NFR_generator
+import UseCases_generator
+import table1_generator
+import table2_generator
+from csvstream import read_path
+
+BASELINE = os.path.join(ROOT, "docgen", "benchmark_baseline.json")
+SIZES = ("ucs", "scenarios", "steps", "nfrs", "fr_width", "rows", "tests")
+
+
+def synthUseCases(n, m, k):
+    Scenario, UseCase = UseCases_generator.Scenario, UseCases_generator.UseCase
+    pre = "Customer has an account and is logged in"
+
+    def scenarios(uc, kind, count):
+        return [
+            Scenario(
+                f"{kind} scenario {s} of use case {uc}",
+                pre,
+                "Customer is notified with proper error",
+                [f"Customer performs step {step} of {kind} {s}" for step in range(k)],
+            )
+            for s in range(count)
+        ]
+
+    nominal = max(1, m // 3)
+    variants = (m - nominal) // 2
+    exceptions = m - nominal - variants
+    return [
+        UseCase(
+            f"Synthetic use case {uc}",
+            "Customer",
+            pre,
+            "Customer is logged in",
+            nominal=scenarios(uc, "nominal", nominal),
+            variants=scenarios(uc, "variant", variants),
+            exceptions=scenarios(uc, "exception", exceptions),
+        )
+        for uc in range(n)
+    ]
+
+
+def synthNFRs(n, width):
+    types = ["Usability", "Reliability", "Scalability", "Efficiency", "Portability", "Security"]
+    return [
+        NFR_generator.NFR(
+            types[i % len(types)],
+            f"Synthetic non functional requirement {i} should take less than 1s",
+            [(fr % 40 + 1, fr % 9 + 1) if fr % 3 else (fr % 40 + 1,) for fr in range(i, i + width)],
+        )
+        for i in range(n)
+    ]
+
+
+def synthTable1(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        for i in range(rows):
+            writer.writerow(
+                [
+                    f"ProductRoutes + ProductController + ProductDAO + db > case {i} > *",
+                    f"GET /ezelectronics/products/{i}",
+                    ("Unit", "Integration", "API")[i % 3],
+                    "BB/equal partitioning\nWB/statement coverage" if i % 10 == 0 else "WB",
+                ]
+            )
+
+
+def synthTable2(path, rows, tests):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        for i in range(rows):
+            cell = "\n".join(
+                f"userRoutes + userController + userDAO + db > GET /ezelectronics/users/{i} > test {t}"
+                for t in range(tests if i % 5 else 0)
+            )
+            writer.writerow([f"FR{i // 10}.{i % 10} Synthetic functional requirement", cell])
+
+
+class Timer:
+    def __init__(self):
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        yield
+        self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def benchUseCases(args, tmp):
+    UseCases_generator.UCs = synthUseCases(args.ucs, args.scenarios, args.steps)
+    timer = Timer()
+    with timer.phase("total"):
+        with timer.phase("anchors"):
+            UseCases_generator.assignAnchors()
+        with timer.phase("render"):
+            links, text = UseCases_generator.UseCases()
+        with timer.phase("write"):
+            with open(os.path.join(tmp, "out.md"), "w") as f:
+                f.write(links)
+                f.write(text)
+    return args.ucs * args.scenarios, timer.phases
+
+
+def benchNFRs(args, tmp):
+    NFR_generator.NFRs = synthNFRs(args.nfrs, args.fr_width)
+    timer = Timer()
+    with timer.phase("total"), contextlib.redirect_stdout(io.StringIO()):
+        NFR_generator.nfr()
+    return args.nfrs, timer.phases
+
+
+def benchTable(generator, src, dst):
+    timer = Timer()
+    with timer.phase("parse"):
+        rows = sum(1 for _ in read_path(src))
+    with timer.phase("total"):
+        generator(src, dst)
+    return rows, timer.phases
+
+
+def run(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        table1 = os.path.join(tmp, "table1.csv")
+        table2 = os.path.join(tmp, "table2.csv")
+        synthTable1(table1, args.rows)
+        synthTable2(table2, args.rows, args.tests)
+
+        benches = {
+            "usecases": lambda: benchUseCases(args, tmp),
+            "nfr": lambda: benchNFRs(args, tmp),
+            "table1": lambda: benchTable(table1_generator.table1, table1, os.path.join(tmp, "table1.md")),
+            "table2": lambda: benchTable(table2_generator.table2, table2, os.path.join(tmp, "table2.md")),
+        }
+        for name, bench in benches.items():
+            best = None
+            for _ in range(args.repeat):
+                items, phases = bench()
+                if best is None or phases["total"] < best[1]["total"]:
+                    best = (items, phases)
+            items, phases = best
+            results[name] = {
+                "items": items,
+                "seconds": phases,
+                "throughput": items / phases["total"],
+            }
+    return results
+
+
+def sizes(args):
+    return {name: getattr(args, name) for name in SIZES}
+
+
+def sizeMismatch(args, baseline):
+    """The options whose value differs from the baseline's, as "--rows 100000" strings."""
+    recorded = baseline.get("sizes", {})
+    return [
+        f"--{name.replace('_', '-')} {recorded.get(name)}"
+        for name, value in sizes(args).items()
+        if recorded.get(name) != value
+    ]
+
+
+def compare(results, baseline, threshold):
+    failed = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["throughput"]
+        change = result["throughput"] / before - 1
+        status = "ok"
+        if change < -threshold:
+            status = "REGRESSION"
+            failed.append(name)
+        print(f"{name:10} {result['throughput']:14,.0f} items/s  ({change:+.1%} vs baseline)  {status}")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the document generators")
+    parser.add_argument("--ucs", type=int, default=1000, help="number of use cases")
+    parser.add_argument("--scenarios", type=int, default=6, help="scenarios per use case")
+    parser.add_argument("--steps", type=int, default=6, help="steps per scenario")
+    parser.add_argument("--nfrs", type=int, default=20000, help="number of NFRs")
+    parser.add_argument("--fr-width", type=int, default=8, help="FR references per NFR")
+    parser.add_argument("--rows", type=int, default=100000, help="rows in table1.csv/table2.csv")
+    parser.add_argument("--tests", type=int, default=6, help="tests per table2.csv cell")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per generator, best is kept")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed throughput drop")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({"sizes": sizes(args), **results}, f, indent=2)
+            f.write("\n")
+        print(json.dumps(results, indent=2))
+        sys.exit(0)
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(json.dumps(results, indent=2))
+        print(f"No baseline at {args.baseline}, run with --save to record one")
+        sys.exit(0)
+
+    # Throughput depends on the input size, so only like runs are compared
+    mismatch = sizeMismatch(args, baseline)
+    if mismatch:
+        print(json.dumps(results, indent=2))
+        print(f"The baseline was recorded with {' '.join(mismatch)}, not compared", file=sys.stderr)
+        sys.exit(2)
+
+    sys.exit(1 if compare(results, baseline, args.threshold) else 0)
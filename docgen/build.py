@@ -0,0 +1,189 @@
+"""Content-addressed build of all generated documents.
+
+    python -m docgen.build [--jobs N] [--force] [generator ...]
+
+Each generator declares its inputs, its outputs and the document regions
+it splices. A generator is skipped when the SHA-1 of every input, output
+and region matches the last successful build recorded in
+docgen/.build-state.json, so a missing output or a hand-edited region is
+rebuilt too. A region is hashed on its own, so a generator splicing into
+a shared document does not make the others stale. Outputs and regions
+are hashed once all generators are done. Files are only re-hashed when
+their mtime or size changed, so a no-op build is a few stat() calls. The
+generators are independent, so stale ones run concurrently on a thread
+pool, each in its own subprocess. Generators that splice into the same
+document serialize on its lock.
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from docgen import REQUIREMENTS, ROOT, TESTREPORT
+from docgen.splice import readRegions
+
+STATE_FILE = os.path.join(ROOT, "docgen", ".build-state.json")
+
+
+class Generator:
+    def __init__(self, name, cwd, script, inputs, outputs, stdout=None, document=None, regions=()):
+        self.name = name
+        self.cwd = cwd
+        self.script = script
+        self.args = ["--splice", document] if document else []
+        self.inputs = [os.path.normpath(os.path.join(cwd, path)) for path in (script, *inputs)]
+        self.outputs = [os.path.normpath(os.path.join(cwd, path)) for path in outputs]
+        self.document = document and os.path.normpath(os.path.join(cwd, document))
+        self.regions = list(regions)
+        self.stdout = stdout
+
+    def run(self):
+        command = [sys.executable, self.script, *self.args]
+        if self.stdout is None:
+            return subprocess.run(command, cwd=self.cwd).returncode
+        with open(os.path.join(self.cwd, self.stdout), "w") as out:
+            return subprocess.run(command, cwd=self.cwd, stdout=out).returncode
+
+
+INSTRUMENT = os.path.join("..", "docgen", "instrument.py")
+OUTPUT = [os.path.join("..", "docgen", name) for name in ("output.py", "splice.py")]
+TEST_REPORT = os.path.join("..", "TestReport.md")
+REQUIREMENTS_DOCUMENT = os.path.join("..", "RequirementsDocumentV2.md")
+
+GENERATORS = [
+    Generator(
+        "table1",
+        TESTREPORT,
+        "table1_generator.py",
+        ["table1.csv", "csvstream.py", "tables.py", INSTRUMENT, *OUTPUT],
+        ["table1.md"],
+        document=TEST_REPORT,
+        regions=["table1"],
+    ),
+    Generator(
+        "table2",
+        TESTREPORT,
+        "table2_generator.py",
+        ["table2.csv", "csvstream.py", "tables.py", "testcoverage.py", "traceability.py", INSTRUMENT, *OUTPUT],
+        ["table2.md"],
+        document=TEST_REPORT,
+        regions=["table2"],
+    ),
+    Generator(
+        "usecases",
+        REQUIREMENTS,
+        "UseCases_generator.py",
+        ["anchors.py", "numbering.py", "steptrie.py", INSTRUMENT, *OUTPUT],
+        ["out.md"],
+        document=REQUIREMENTS_DOCUMENT,
+        regions=["usecases-toc", "usecases"],
+    ),
+    Generator("nfr", REQUIREMENTS, "NFR_generator.py", ["numbering.py", INSTRUMENT], ["nfr.md"], stdout="nfr.md"),
+]
+
+
+class State:
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.files = data.get("files", {})  # path -> [mtime_ns, size, sha1]
+        self.regions = data.get("regions", {})  # document -> [mtime_ns, size, {region: sha1}]
+        self.builds = data.get("builds", {})  # generator -> {input, output or document#region: sha1}
+
+    def digest(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        known = self.files.get(path)
+        if known and known[:2] == [st.st_mtime_ns, st.st_size]:
+            return known[2]
+        with open(path, "rb") as f:
+            sha1 = hashlib.file_digest(f, "sha1").hexdigest()
+        self.files[path] = [st.st_mtime_ns, st.st_size, sha1]
+        return sha1
+
+    def regionDigest(self, path, name):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        known = self.regions.get(path)
+        if not known or known[:2] != [st.st_mtime_ns, st.st_size]:
+            try:
+                digests = {region: hashlib.sha1(text).hexdigest() for region, text in readRegions(path).items()}
+            except ValueError:
+                digests = {}
+            known = self.regions[path] = [st.st_mtime_ns, st.st_size, digests]
+        return known[2].get(name)
+
+    def fingerprint(self, generator):
+        return {path: self.digest(path) for path in generator.inputs}
+
+    def outputs(self, generator):
+        digests = {path: self.digest(path) for path in generator.outputs}
+        for region in generator.regions:
+            digests[f"{generator.document}#{region}"] = self.regionDigest(generator.document, region)
+        return digests
+
+    def upToDate(self, generator, fingerprint):
+        # A deleted output or region hashes to None, so it no longer matches
+        return self.builds.get(generator.name) == fingerprint
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"files": self.files, "regions": self.regions, "builds": self.builds}, f)
+        os.replace(tmp, self.path)
+
+
+def build(generators, jobs=None, force=False):
+    state = State()
+    fingerprints = {g.name: {**state.fingerprint(g), **state.outputs(g)} for g in generators}
+    stale = [g for g in generators if force or not state.upToDate(g, fingerprints[g.name])]
+
+    def run(generator):
+        start = time.perf_counter()
+        status = generator.run()
+        return generator, status, time.perf_counter() - start
+
+    built, failed = [], []
+    if stale:
+        with ThreadPoolExecutor(jobs or len(stale)) as pool:
+            for generator, status, elapsed in pool.map(run, stale):
+                print(f"[build] {generator.name}: {'ok' if status == 0 else 'FAILED'} in {elapsed * 1000:.0f} ms")
+                if status == 0:
+                    built.append(generator)
+                else:
+                    failed.append(generator.name)
+    # The inputs as they were when the build started, so edits made meanwhile
+    # are picked up next time, and the outputs and regions as the last
+    # generator left them. A shared document is only re-read once.
+    for generator in built:
+        state.builds[generator.name] = {**fingerprints[generator.name], **state.outputs(generator)}
+    for generator in generators:
+        if generator not in stale:
+            print(f"[build] {generator.name}: up to date")
+    state.save()
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the generated documents")
+    parser.add_argument("-j", "--jobs", type=int, help="generators run at once (default: all stale)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if inputs are unchanged")
+    parser.add_argument("only", nargs="*", help="generators to build (default: all)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    failed = build([g for g in GENERATORS if not args.only or g.name in args.only], args.jobs, args.force)
+    print(f"[build] done in {(time.perf_counter() - start) * 1000:.1f} ms")
+    sys.exit(1 if failed else 0)
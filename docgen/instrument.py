@@ -0,0 +1,213 @@
+"""Opt-in timing and counters for the document generators.
+
+Enabled with a generator's --profile PATH flag or the DOCGEN_PROFILE
+environment variable. A PATH ending in .prof or .pstats gets a cProfile
+dump; any other PATH gets a JSON report with the wall time and call
+count of each phase (load, slug, render, write), plus counters such as
+bytes written and rows or scenarios processed.
+
+DOCGEN_PROFILE applies to every generator a build runs, so the
+generator's name is put before the extension of its PATH: with
+DOCGEN_PROFILE=report.json, table1 writes report.table1.json.
+
+While disabled, phase() returns a shared no-op context manager and the
+wrapping helpers hand back their argument untouched, so the hooks can
+stay in place.
+"""
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+
+ENV = "DOCGEN_PROFILE"
+
+_NULL = contextlib.nullcontext()
+
+
+class Recorder:
+    def __init__(self, name):
+        self.name = name
+        self.phases = {}
+        self.counters = {}
+        self.stack = []
+        self.start = time.perf_counter()
+
+    def begin(self):
+        self.stack.append(0.0)
+        return time.perf_counter()
+
+    def end(self, name, start):
+        # Time spent in nested phases is only charged to the innermost one
+        elapsed = time.perf_counter() - start
+        nested = self.stack.pop()
+        if self.stack:
+            self.stack[-1] += elapsed
+        entry = self.phases.get(name)
+        if entry is None:
+            entry = self.phases[name] = [0.0, 0]
+        entry[0] += elapsed - nested
+        entry[1] += 1
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = self.begin()
+        try:
+            yield
+        finally:
+            self.end(name, start)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self):
+        return {
+            "generator": self.name,
+            "wall_seconds": time.perf_counter() - self.start,
+            "phases": {
+                name: {"seconds": seconds, "calls": calls}
+                for name, (seconds, calls) in self.phases.items()
+            },
+            "counters": self.counters,
+        }
+
+
+recorder = None
+_profile = None
+_target = None
+_patched = []  # (owner, attr, original), restored by finish()
+
+
+def enable(name, target):
+    global recorder, _profile, _target
+    recorder = Recorder(name)
+    _target = target
+    if target.endswith((".prof", ".pstats")):
+        _profile = cProfile.Profile()
+        _profile.enable()
+
+
+def envTarget(name):
+    """DOCGEN_PROFILE, made specific to generator `name`."""
+    target = os.environ.get(ENV)
+    if not target or target == "-":
+        return target
+    root, ext = os.path.splitext(target)
+    return f"{root}.{name}{ext}"
+
+
+def setup(name, target=None):
+    target = target or envTarget(name)
+    if target:
+        enable(name, target)
+
+
+def finish():
+    global recorder, _profile
+    if recorder is None:
+        return
+    while _patched:
+        owner, attr, original = _patched.pop()
+        setattr(owner, attr, original)
+    if _profile is not None:
+        _profile.disable()
+        _profile.dump_stats(_target)
+    elif _target == "-":
+        json.dump(recorder.report(), sys.stderr, indent=2)
+        sys.stderr.write("\n")
+    else:
+        with open(_target, "w") as f:
+            json.dump(recorder.report(), f, indent=2)
+            f.write("\n")
+    recorder = _profile = None
+
+
+@contextlib.contextmanager
+def session(name, target=None):
+    setup(name, target)
+    try:
+        yield
+    finally:
+        finish()
+
+
+def phase(name):
+    return _NULL if recorder is None else recorder.phase(name)
+
+
+def count(name, n=1):
+    if recorder is not None:
+        recorder.count(name, n)
+
+
+def iterate(name, items, counter=None):
+    """Charge the time spent producing each item to phase `name`."""
+    if recorder is None:
+        return items
+    return _iterate(name, iter(items), counter)
+
+
+def _iterate(name, items, counter):
+    rec = recorder
+    n = 0
+    try:
+        while True:
+            start = rec.begin()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                rec.end(name, start)
+            n += 1
+            yield item
+    finally:
+        if counter:
+            rec.count(counter, n)
+
+
+def wrap(name, fn):
+    if recorder is None:
+        return fn
+
+    @functools.wraps(fn)
+    def timed(*args, **kwargs):
+        # A wrapper kept past finish() falls back to the plain call
+        if recorder is None:
+            return fn(*args, **kwargs)
+        with recorder.phase(name):
+            return fn(*args, **kwargs)
+
+    for attr in ("cache_info", "cache_clear"):
+        if hasattr(fn, attr):
+            setattr(timed, attr, getattr(fn, attr))
+    return timed
+
+
+def patch(owner, attr, name):
+    """Replace owner.attr with a timed version until finish() restores it."""
+    if recorder is not None:
+        original = getattr(owner, attr)
+        _patched.append((owner, attr, original))
+        setattr(owner, attr, wrap(name, original))
+
+
+class _Writer:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, s):
+        with recorder.phase("write"):
+            n = self.f.write(s)
+        recorder.count("bytes_written", len(s.encode()) if isinstance(s, str) else len(s))
+        return n
+
+    def __getattr__(self, attr):
+        return getattr(self.f, attr)
+
+
+def writer(f):
+    """Wrap a file so writes are timed and their size counted."""
+    return f if recorder is None else _Writer(f)
@@ -0,0 +1,123 @@
+"""Atomic, write-if-changed output files.
+
+    with open_output("table1.md") as out:
+        out.write(text)
+
+The output is hashed as it is written and held in memory, or in a
+temporary file next to the target once it grows past SPOOL_BYTES. On
+close, its SHA-1 is compared with the sidecar ".<name>.sha1" left by the
+previous run. If they match and the target still has the size and mtime
+recorded in the sidecar, nothing is written and the target's mtime is
+untouched. Otherwise the content goes to a temporary file that is
+renamed over the target with os.replace(). Readers never see a
+half-written file, and an interrupted run leaves the previous output in
+place.
+"""
+import hashlib
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+SPOOL_BYTES = 1 << 23
+
+
+def sidecar(path):
+    head, name = os.path.split(path)
+    return os.path.join(head, f".{name}.sha1")
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _replace(tmp, path, data=None):
+    if data is not None:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Output:
+    def __init__(self, path, encoding="utf-8"):
+        self.path = path
+        self.encoding = encoding
+        self.tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+        self.sha1 = hashlib.sha1()
+        self.chunks = []
+        self.size = 0
+        self.file = None  # the temporary file, once spilled
+        self.changed = None
+
+    def write(self, text):
+        self.writeBytes(text.encode(self.encoding))
+
+    def writeBytes(self, data):
+        self.sha1.update(data)
+        self.size += len(data)
+        if self.file is not None:
+            self.file.write(data)
+            return
+        self.chunks.append(data)
+        if self.size > SPOOL_BYTES:
+            self.file = open(self.tmp, "wb", buffering=1 << 20)
+            self.file.write(b"".join(self.chunks))
+            self.chunks = None
+
+    def unchanged(self, digest):
+        try:
+            with open(sidecar(self.path)) as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return previous.get("sha1") == digest and previous.get("stamp") == _stamp(self.path)
+
+    def commit(self):
+        """Replace the target if the content changed; returns True if it did."""
+        digest = self.sha1.hexdigest()
+        self.changed = not self.unchanged(digest)
+        if self.file is not None:
+            self.file.flush()
+            if self.changed:
+                os.fsync(self.file.fileno())
+            self.file.close()
+        if not self.changed:
+            self.discard()
+            return False
+
+        _replace(self.tmp, self.path, None if self.file is not None else b"".join(self.chunks))
+        self.chunks = self.file = None
+        record = json.dumps({"sha1": digest, "stamp": _stamp(self.path)})
+        _replace(self.tmp, sidecar(self.path), record.encode())
+        return True
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        try:
+            os.unlink(self.tmp)
+        except FileNotFoundError:
+            pass
+        self.chunks = None
+
+
+@contextmanager
+def open_output(path, encoding="utf-8"):
+    """Text output to `path` ('-' for stdout), written only if it changed."""
+    if path == "-":
+        yield sys.stdout
+        return
+    out = Output(path, encoding)
+    try:
+        yield out
+    except BaseException:
+        out.discard()
+        raise
+    out.commit()
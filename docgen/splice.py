@@ -0,0 +1,209 @@
+"""Splice generated sections into marker-delimited regions of a document.
+
+    <!-- BEGIN:usecases -->
+    ...replaced on every run...
+    <!-- END:usecases -->
+
+    python -m docgen.splice DOCUMENT NAME=FILE [NAME=FILE ...]
+
+The document is memory-mapped and scanned for BEGIN markers with
+mmap.find(). Text outside the requested regions is copied through as a
+few large slices, and the marker lines themselves are kept. All regions
+are replaced in one pass over the document. A line whose content is
+unchanged keeps its formatting in the document, such as aligned table
+columns, list indentation and escaped asterisks, so hand-formatted
+regions only change where the generated content does. The result goes through
+docgen.output, so the document is replaced atomically, and only if it
+changed. Generators that share a document take an exclusive lock on it
+for the read-modify-write.
+"""
+import argparse
+import mmap
+import os
+import re
+import sys
+from contextlib import contextmanager
+from difflib import SequenceMatcher
+
+from docgen.output import Output
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locking
+    fcntl = None
+
+BEGIN = b"<!-- BEGIN:"
+END = b"<!-- END:%s -->"
+CELL = re.compile(r"(?<!\\)\|")
+RULE = re.compile(r":?-+:?")
+ESCAPE = re.compile(r"\\([*_])")
+
+
+@contextmanager
+def locked(path):
+    if fcntl is None:
+        yield
+        return
+    head, name = os.path.split(path)
+    with open(os.path.join(head, f".{name}.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _lineEnd(mm, pos):
+    end = mm.find(b"\n", pos)
+    return len(mm) if end < 0 else end + 1
+
+
+def _normalize(line):
+    """A Markdown line without the formatting that does not change how it renders.
+
+    Whitespace runs, table cell padding, the length of rule dashes and the
+    backslash in \\* and \\_ are dropped. The indentation is kept as one
+    tab per level, a level being a tab or four spaces.
+    """
+    body = line.lstrip()
+    level = len(line[: len(line) - len(body)].expandtabs(4)) // 4
+    text = " ".join(ESCAPE.sub(r"\1", body).split())
+    if text.startswith("|"):
+        cells = CELL.split(text[1:])
+        if len(cells) > 1 and not cells[-1]:
+            del cells[-1]
+        cells = [cell.strip() for cell in cells]
+        if all(map(RULE.fullmatch, cells)):
+            cells = [re.sub("-+", "-", cell) for cell in cells]
+        return "|" + "|".join(cells)
+    return "\t" * level + text
+
+
+def _keepFormatting(old, new):
+    """`new`, with the lines whose content is unchanged taken from `old`."""
+    oldLines, newLines = old.split("\n"), new.split("\n")
+    normalized = {line: _normalize(line) for line in {*oldLines, *newLines}}
+    a, b = [normalized[line] for line in oldLines], [normalized[line] for line in newLines]
+    if a == b:
+        return old
+    lines = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        lines += oldLines[i1:i2] if tag == "equal" else newLines[j1:j2]
+    return "\n".join(lines)
+
+
+def _writeRegion(out, content, old):
+    if not isinstance(content, (str, bytes)):
+        # A binary file
+        content = content.read()
+    if old:
+        if isinstance(content, bytes):
+            content = content.decode(out.encoding)
+        content = _keepFormatting(old.decode(out.encoding), content)
+    if isinstance(content, str):
+        content = content.encode(out.encoding)
+    out.writeBytes(content)
+    if content[-1:] not in (b"", b"\n"):
+        out.writeBytes(b"\n")
+
+
+def _splice(mm, regions, out):
+    view = memoryview(mm)
+    try:
+        done = set()
+        pos = 0
+        while (start := mm.find(BEGIN, pos)) >= 0:
+            close = mm.find(b" -->", start, _lineEnd(mm, start))
+            if close < 0:
+                raise ValueError(f"malformed marker at byte {start}")
+            name = bytes(view[start + len(BEGIN) : close]).decode()
+            end = _lineEnd(mm, start)
+            if name not in regions:
+                out.writeBytes(bytes(view[pos:end]))
+                pos = end
+                continue
+            if name in done:
+                raise ValueError(f"region {name!r} appears more than once")
+            stop = mm.find(END % name.encode(), end)
+            if stop < 0:
+                raise ValueError(f"region {name!r} has no END marker")
+            out.writeBytes(bytes(view[pos:end]))
+            pos = mm.rfind(b"\n", end - 1, stop) + 1
+            _writeRegion(out, regions[name], bytes(view[end:pos]))
+            done.add(name)
+        out.writeBytes(bytes(view[pos:]))
+    finally:
+        view.release()
+
+    missing = set(regions) - done
+    if missing:
+        raise ValueError(f"no region named {', '.join(sorted(missing))}")
+
+
+def readRegions(path):
+    """The regions of the document at `path`, as a {name: content} dict of bytes."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            found = {}
+            pos = 0
+            while (start := mm.find(BEGIN, pos)) >= 0:
+                end = _lineEnd(mm, start)
+                close = mm.find(b" -->", start, end)
+                if close < 0:
+                    raise ValueError(f"malformed marker at byte {start}")
+                name = mm[start + len(BEGIN) : close].decode()
+                stop = mm.find(END % name.encode(), end)
+                if stop < 0:
+                    raise ValueError(f"region {name!r} has no END marker")
+                found[name] = mm[end : mm.rfind(b"\n", end - 1, stop) + 1]
+                pos = _lineEnd(mm, stop)
+            return found
+
+
+def splice(path, regions):
+    """Replace the regions of the document at `path`; True if it changed.
+
+    `regions` maps region names to their new content: text, bytes or a
+    binary file. Nothing is written if a region is missing or malformed.
+    """
+    with locked(path):
+        out = Output(path)
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    raise ValueError(f"no region named {', '.join(sorted(regions))}")
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    _splice(mm, regions, out)
+        except BaseException:
+            out.discard()
+            raise
+        return out.commit()
+
+
+@contextmanager
+def opened(paths):
+    files = []
+    try:
+        for path in paths:
+            files.append(open(path, "rb"))
+        yield files
+    finally:
+        for f in files:
+            f.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Splice files into the marker regions of a document")
+    parser.add_argument("document")
+    parser.add_argument("regions", nargs="+", metavar="NAME=FILE", help="region name and the file to put in it")
+    args = parser.parse_args()
+
+    names, paths = zip(*(region.split("=", 1) for region in args.regions))
+    try:
+        with opened(paths) as files:
+            changed = splice(args.document, dict(zip(names, files)))
+    except ValueError as e:
+        sys.exit(f"{args.document}: {e}")
+    print(f"{args.document}: {'updated' if changed else 'unchanged'}")
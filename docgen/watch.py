@@ -0,0 +1,70 @@
+"""Rebuild generated documents when their inputs change.
+
+    python -m docgen.watch [--interval 0.1] [--debounce 0.2] [--initial]
+
+Inputs are polled with os.stat(), which is cheap at this scale. A burst
+of saves is collected until the inputs have been quiet for --debounce
+seconds. Then only the generators that read a changed file are re-run,
+each from its own directory.
+"""
+import argparse
+import os
+import time
+
+from docgen.build import GENERATORS
+
+
+def snapshot(paths):
+    state = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            state[path] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            state[path] = None
+    return state
+
+
+def rebuild(generators):
+    for generator in generators:
+        start = time.perf_counter()
+        status = generator.run()
+        elapsed = (time.perf_counter() - start) * 1000
+        result = "ok" if status == 0 else f"failed ({status})"
+        print(f"[watch] {generator.name}: {result} in {elapsed:.0f} ms", flush=True)
+
+
+def watch(generators, interval, debounce):
+    paths = sorted({path for generator in generators for path in generator.inputs})
+    last = snapshot(paths)
+    pending = set()
+    lastChange = 0.0
+    while True:
+        time.sleep(interval)
+        current = snapshot(paths)
+        changed = {path for path in paths if current[path] != last[path]}
+        last = current
+        now = time.monotonic()
+        if changed:
+            pending |= changed
+            lastChange = now
+        elif pending and now - lastChange >= debounce:
+            rebuild([g for g in generators if pending.intersection(g.inputs)])
+            pending.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild generated documents on change")
+    parser.add_argument("--interval", type=float, default=0.1, help="polling interval in seconds")
+    parser.add_argument("--debounce", type=float, default=0.2, help="quiet time before rebuilding")
+    parser.add_argument("--initial", action="store_true", help="build everything once at startup")
+    parser.add_argument("only", nargs="*", help="generators to watch (default: all)")
+    args = parser.parse_args()
+
+    generators = [g for g in GENERATORS if not args.only or g.name in args.only]
+    if args.initial:
+        rebuild(generators)
+    try:
+        watch(generators, args.interval, args.debounce)
+    except KeyboardInterrupt:
+        pass